@@ -0,0 +1,116 @@
+import hmac
+
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from app import profiling
+from app.response import ApiJSONResponse, ApiResponse
+from app.settings import settings
+
+
+def require_admin(x_admin_token: str = Header("")):
+    # compared as bytes, compare_digest rejects non-ASCII str
+    if not settings.ADMIN_TOKEN or not hmac.compare_digest(
+            x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="forbidden")
+
+
+app = FastAPI(title="Admin app",
+              default_response_class=ApiJSONResponse,
+              dependencies=[Depends(require_admin)])
+
+
+class ProfileRequest(BaseModel):
+    seconds: float | None = Field(None, gt=0, le=600)
+    requests: int | None = Field(None, gt=0)
+    interval: float = Field(0.005, ge=0.001, le=1)
+    torch: bool = True
+
+
+# Routes are async so that the torch profiler is started and stopped on the
+# event loop thread, like the profiled requests.
+
+
+def current_session() -> profiling.ProfileSession:
+    if profiling.session is None:
+        raise HTTPException(status_code=404, detail="no profile")
+    if profiling.session.finished:
+        profiling.session.stop()
+    return profiling.session
+
+
+@app.post("/profile", response_model=ApiResponse)
+async def start_profile(payload: ProfileRequest):
+    """
+    Start profiling this worker.
+
+    Python stacks of every thread are sampled each `interval` seconds and, with
+    `torch`, torch operators are recorded, until `seconds` have elapsed or
+    `requests` requests have been served. Only the worker serving this request
+    is profiled.
+
+    Example Request:
+    ```
+    POST /admin/profile
+    X-Admin-Token: <token>
+    {"requests": 50}
+    ```
+    """
+    if not payload.seconds and not payload.requests:
+        raise HTTPException(status_code=400,
+                            detail="seconds or requests required")
+    if profiling.session is not None and not profiling.session.stopped:
+        raise HTTPException(status_code=409, detail="profile running")
+    profiling.session = profiling.ProfileSession(
+        seconds=payload.seconds,
+        requests=payload.requests,
+        interval=payload.interval,
+        torch_profile=payload.torch)
+    profiling.session.start()
+    return ApiResponse(data={"started": profiling.session.started})
+
+
+@app.get("/profile", response_model=ApiResponse)
+async def get_profile():
+    """
+    Get the last profile.
+
+    Returns the collapsed stacks and, once the profile is stopped, the torch
+    operators breakdown per model, `other` holding operators run outside of
+    model calls:
+
+    ```
+    {
+        "data": {
+            "running": false,
+            "samples": 5230,
+            "collapsed": "<module> (app.py:1);run (server.py:60);... 12\\n...",
+            "operators": {
+                "distilbert-base-uncased-finetuned-sst-2-english": [
+                    {"op": "aten::addmm", "calls": 1200, "self_cpu_ms": 812.4},
+                    ...
+                ]
+            }
+        }
+    }
+    ```
+    """
+    return ApiResponse(data=current_session().result())
+
+
+@app.get("/profile/collapsed", response_class=PlainTextResponse)
+async def get_profile_collapsed():
+    """
+    Get the sampled stacks in the collapsed format read by flamegraph.pl,
+    speedscope or inferno.
+    """
+    return current_session().collapsed()
+
+
+@app.delete("/profile", response_model=ApiResponse)
+async def stop_profile():
+    """Stop the running profile and return it."""
+    session = current_session()
+    session.stop()
+    return ApiResponse(data=session.result())
@@ -0,0 +1,233 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from app.logger import logger
+from app.settings import parse_mapping, settings
+
+
+class RouteStats:
+    """Service time and in-flight requests of the model behind a route."""
+
+    __slots__ = ("service_time", "prior", "measured", "inflight", "started",
+                 "slo")
+
+    def __init__(self):
+        self.service_time = 0.0
+        self.prior = None
+        self.measured = False
+        self.inflight = 0
+        self.started = []
+        self.slo = math.inf
+
+
+class AdmissionController:
+    """
+    Bound the work queued behind slow models.
+
+    Each route serves a single model, so stats are tracked per route. Model
+    inference runs on the worker event loop, one request at a time, which
+    means a new request waits for the backlog of the worker: the sum of
+    `inflight * service_time` over routes.
+
+    Routes whose service time is above `heavy_threshold` are heavy. Until a
+    route has served a request, its service time is the `prior` it was
+    registered with, and a route without prior counts as heavy.
+
+    - A heavy request is rejected with 429 when the whole backlog exceeds its
+      SLO. Heavy routes can't use the last `reserved` slots, which are kept
+      for cheap routes.
+    - A cheap request is rejected with 429 when the backlog of cheap routes,
+      plus what is left of the heavy request running now, exceeds its SLO.
+      Queued heavy requests are left out: they are bounded by the slots.
+
+    Any request is rejected with 503 when no slot is free. With `defer` set, a
+    request lacking a slot waits up to that many seconds for one instead of
+    being rejected right away.
+    """
+
+    def __init__(self,
+                 max_inflight: int,
+                 reserved: int = 0,
+                 heavy_threshold: float = 0.5,
+                 defer: float = 0.0,
+                 alpha: float = 0.2):
+        self.max_inflight = max_inflight
+        self.reserved = min(reserved, max_inflight - 1)
+        self.heavy_threshold = heavy_threshold
+        self.defer = defer
+        self.alpha = alpha
+        self.inflight = 0
+        self.routes: dict[str, RouteStats] = {}
+        self._released = asyncio.Event()
+
+    def register(self, route: str, slo: float, prior: float | None = None):
+        """Set the SLO of a route and its expected service time until it is
+        measured."""
+        stats = self.stats(route)
+        stats.slo = slo
+        stats.prior = prior
+        if prior is not None and not stats.measured:
+            stats.service_time = prior
+
+    def stats(self, route: str) -> RouteStats:
+        if route not in self.routes:
+            self.routes[route] = RouteStats()
+        return self.routes[route]
+
+    def predicted_wait(self, heavy: bool = None) -> float:
+        """Backlog of the worker, or of heavy or cheap routes only."""
+        return sum(s.inflight * s.service_time
+                   for route, s in self.routes.items()
+                   if heavy is None or self.is_heavy(route) == heavy)
+
+    def running_heavy(self) -> float:
+        """Time left to the heavy request running now, taken as the oldest
+        admitted one."""
+        now = time.perf_counter()
+        left = [
+            s.service_time - (now - min(s.started))
+            for route, s in self.routes.items()
+            if s.started and self.is_heavy(route)
+        ]
+        return max([0.0, *left])
+
+    def is_heavy(self, route: str) -> bool:
+        stats = self.stats(route)
+        if not stats.measured and stats.prior is None:
+            return True
+        return stats.service_time > self.heavy_threshold
+
+    def capacity(self, route: str) -> int:
+        if self.is_heavy(route):
+            return self.max_inflight - self.reserved
+        return self.max_inflight
+
+    def has_slot(self, route: str) -> bool:
+        if self.inflight >= self.capacity(route):
+            return False
+        if not self.is_heavy(route):
+            return True
+        heavy = sum(s.inflight for r, s in self.routes.items()
+                    if self.is_heavy(r))
+        return heavy < self.capacity(route)
+
+    async def acquire(self, route: str, slo: float) -> float:
+        """Admit a request or raise an `HTTPException`.
+
+        Returns the admission time to hand back to `release`.
+        """
+        if self.is_heavy(route):
+            wait = self.predicted_wait()
+        else:
+            wait = self.predicted_wait(heavy=False) + self.running_heavy()
+        if wait > slo:
+            logger.warning(f"admission: {route} rejected, predicted wait "
+                           f"{wait:.2f}s above slo {slo:.2f}s")
+            raise HTTPException(
+                status_code=429,
+                detail="server busy, retry later",
+                headers={"Retry-After": str(max(1, math.ceil(wait - slo)))})
+        deadline = time.monotonic() + self.defer
+        while not self.has_slot(route):
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                logger.warning(f"admission: {route} rejected, no free slot")
+                raise HTTPException(status_code=503,
+                                    detail="server overloaded",
+                                    headers={"Retry-After": "1"})
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), timeout)
+            except (asyncio.TimeoutError, ):
+                pass
+        started = time.perf_counter()
+        stats = self.stats(route)
+        self.inflight += 1
+        stats.inflight += 1
+        stats.started.append(started)
+        return started
+
+    def release(self, route: str, started: float):
+        stats = self.stats(route)
+        elapsed = time.perf_counter() - started
+        if stats.measured:
+            stats.service_time += self.alpha * (elapsed - stats.service_time)
+        else:
+            stats.service_time = elapsed
+            stats.measured = True
+        stats.started.remove(started)
+        stats.inflight -= 1
+        self.inflight -= 1
+        self._released.set()
+
+    def snapshot(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "predicted_wait": self.predicted_wait(),
+            "cheap_wait": self.predicted_wait(heavy=False),
+            "running_heavy": self.running_heavy(),
+            "routes": {
+                route: {
+                    "inflight": s.inflight,
+                    "service_time": s.service_time,
+                    "slo": s.slo,
+                    "heavy": self.is_heavy(route),
+                }
+                for route, s in self.routes.items()
+            },
+        }
+
+
+controller = AdmissionController(
+    max_inflight=settings.ADMISSION_MAX_INFLIGHT,
+    reserved=settings.ADMISSION_RESERVED,
+    heavy_threshold=settings.ADMISSION_HEAVY_THRESHOLD,
+    defer=settings.ADMISSION_DEFER,
+)
+slos = parse_mapping(settings.ADMISSION_SLOS, float)
+priors = parse_mapping(settings.ADMISSION_PRIORS, float)
+
+
+@asynccontextmanager
+async def admitted(route: str):
+    """
+    Count a block of work under `route`, or raise an `HTTPException`.
+
+    Usage:
+    ```
+    async with admitted("text/classifier"):
+        results = await processors.classify(texts)
+    ```
+    """
+    if not settings.ADMISSION_ENABLED:
+        yield
+        return
+    slo = slos.get(route, settings.ADMISSION_DEFAULT_SLO)
+    started = await controller.acquire(route, slo)
+    try:
+        yield
+    finally:
+        controller.release(route, started)
+
+
+def admit(route: str):
+    """
+    Build a route dependency enforcing admission control.
+
+    Usage:
+    ```
+    @app.post("/classifier", dependencies=[Depends(admit("text/classifier"))])
+    ```
+    """
+    slo = slos.get(route, settings.ADMISSION_DEFAULT_SLO)
+    controller.register(route, slo, priors.get(route))
+
+    async def dependency():
+        async with admitted(route):
+            yield
+
+    return dependency
@@ -1,10 +0,0 @@
-from fastapi import FastAPI
-
-from app.response import ApiResponse
-
-app = FastAPI(title="Audio processing app")
-
-
-@app.get("/", response_model=ApiResponse)
-async def desc():
-    return ApiResponse(data={"app": "audio"})
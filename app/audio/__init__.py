@@ -0,0 +1,82 @@
+import av
+from fastapi import Depends, FastAPI, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.admission import admit
+from app.audio import processor
+from app.logger import logger
+from app.media import ndjson, open_upload
+from app.response import ApiJSONResponse, ApiResponse, respond
+from app.settings import settings
+
+app = FastAPI(title="Audio processing app",
+              default_response_class=ApiJSONResponse)
+
+
+class TranscriptionOutput(BaseModel):
+    text: str
+
+
+class TranscriptionResponse(ApiResponse):
+    data: TranscriptionOutput
+
+
+@app.get("/", response_model=ApiResponse)
+async def desc():
+    return ApiResponse(data={"app": "audio"})
+
+
+@app.post("/transcribe",
+          response_model=TranscriptionResponse,
+          dependencies=[Depends(admit("audio/transcribe"))])
+def transcribe(payload: UploadFile, stream: bool = True):
+    """
+    Speech to text.
+
+    Transcribe an uploaded recording. The audio is decoded and resampled in a
+    stream, split into overlapping chunks on silences, and chunks are transcribed
+    in batches, so long recordings never sit in memory as a whole.
+
+    Parameters:
+    - **payload**: The uploaded audio file.
+    - **stream**: Stream partial transcripts as NDJSON (default) or return the
+      full transcript once done.
+
+    Returns:
+    - **application/x-ndjson**: One line per transcribed chunk, then a line holding
+      the full transcript.
+    - **TranscriptionResponse**: The full transcript when `stream` is false.
+
+    Files that can't be decoded or hold no audio track are rejected with 400. Data
+    corrupted past the start of a streamed file ends the stream with an `error` line.
+
+    Example Response:
+    ```
+    {"start": 0.0, "end": 18.42, "text": "Hello and welcome to the show."}
+    {"start": 17.42, "end": 37.1, "text": "Today we talk about speech recognition."}
+    {"text": "Hello and welcome to the show. Today we talk about speech recognition."}
+    ```
+    """
+    recording = open_upload(payload, "audio", settings.AUDIO_CTYPES,
+                            settings.AUDIO_MAXSIZE)
+    if not stream:
+        with recording:
+            try:
+                transcripts = processor.transcribe(recording)
+                text = " ".join(text for _, text in transcripts if text)
+            except (av.FFmpegError, ) as exc:
+                logger.error(exc)
+                raise HTTPException(status_code=400,
+                                    detail="invalid audio data")
+        return respond(TranscriptionResponse, {"text": text})
+
+    def lines():
+        full = []
+        for chunk, text in processor.transcribe(recording):
+            full.append(text)
+            yield {"start": chunk.start, "end": chunk.end, "text": text}
+        yield {"text": " ".join(t for t in full if t)}
+
+    return StreamingResponse(ndjson(recording, "audio", lines()),
+                             media_type="application/x-ndjson")
@@ -0,0 +1,56 @@
+import re
+from itertools import islice
+
+from app import startup
+from app.audio.stream import SAMPLE_RATE, decode, split_chunks
+from app.settings import settings
+
+
+def get_pipeline(model):
+    return startup.get_pipeline("automatic-speech-recognition",
+                                model,
+                                device="cpu")
+
+
+def _words(text):
+    return [re.sub(r"\W", "", w).lower() for w in text.split()]
+
+
+def stitch(previous, text, max_overlap=8):
+    """
+    Drop from `text` the words repeated from the end of `previous`.
+
+    Consecutive chunks overlap, so the first words of a chunk transcript may
+    repeat the last words of the previous one.
+    """
+    tail, words = _words(previous)[-max_overlap:], text.split()
+    head = _words(text)
+    for size in range(min(len(tail), len(head)), 0, -1):
+        if tail[-size:] == head[:size]:
+            return " ".join(words[size:])
+    return text.strip()
+
+
+def transcribe(file):
+    """
+    Transcribe an audio file chunk by chunk.
+
+    Yields `(chunk, text)` pairs as soon as each batch of chunks is
+    transcribed, with `text` stitched to the previous chunk.
+    """
+    pipe = get_pipeline(settings.ASR_MODEL)
+    chunks = split_chunks(decode(file),
+                          chunk_seconds=settings.ASR_CHUNK_SECONDS,
+                          overlap_seconds=settings.ASR_OVERLAP_SECONDS,
+                          threshold=settings.ASR_VAD_THRESHOLD)
+    previous = ""
+    while batch := list(islice(chunks, settings.ASR_BATCH_SIZE)):
+        inputs = [{
+            "raw": chunk.samples,
+            "sampling_rate": SAMPLE_RATE
+        } for chunk in batch]
+        outputs = pipe(inputs, batch_size=len(batch))
+        for chunk, output in zip(batch, outputs):
+            text = stitch(previous, output["text"])
+            previous = output["text"]
+            yield chunk, text
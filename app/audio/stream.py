@@ -0,0 +1,83 @@
+from typing import BinaryIO, Iterator, NamedTuple
+
+import av
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME = SAMPLE_RATE * 30 // 1000  # 30 ms
+
+
+class Chunk(NamedTuple):
+    start: float
+    end: float
+    samples: np.ndarray
+
+
+def decode(file: BinaryIO,
+           sample_rate: int = SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Decode an audio file frame by frame into mono float32 samples.
+
+    Frames are resampled to `sample_rate` as they are decoded, so the whole
+    waveform is never held in memory.
+    """
+    with av.open(file) as container:
+        stream = container.streams.audio[0]
+        resampler = av.AudioResampler(format="flt",
+                                      layout="mono",
+                                      rate=sample_rate)
+        for frame in container.decode(stream):
+            for out in resampler.resample(frame):
+                yield out.to_ndarray().reshape(-1)
+        for out in resampler.resample(None):
+            yield out.to_ndarray().reshape(-1)
+
+
+def frame_energy(samples: np.ndarray) -> np.ndarray:
+    """Energy in dBFS of each 30 ms frame."""
+    count = max(len(samples) // FRAME, 1)
+    frames = np.resize(samples, count * FRAME).reshape(count, FRAME)
+    return 10 * np.log10(np.mean(frames**2, axis=1) + 1e-12)
+
+
+def has_voice(samples: np.ndarray, threshold: float) -> bool:
+    return bool((frame_energy(samples) > threshold).any())
+
+
+def split_chunks(blocks: Iterator[np.ndarray],
+                 chunk_seconds: float,
+                 overlap_seconds: float,
+                 threshold: float) -> Iterator[Chunk]:
+    """
+    Group decoded blocks into overlapping chunks cut on silences.
+
+    A chunk is cut at the quietest frame of its last quarter, and the next
+    chunk starts `overlap_seconds` before the cut. Chunks without any voiced
+    frame (energy above `threshold` dBFS) are dropped.
+    """
+    chunk_len = int(chunk_seconds * SAMPLE_RATE)
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    search = chunk_len // 4
+    pending, size, offset = [], 0, 0
+    for block in blocks:
+        pending.append(block)
+        size += len(block)
+        if size < chunk_len:
+            continue
+        buffer = np.concatenate(pending)
+        while len(buffer) >= chunk_len:
+            window = buffer[chunk_len - search:chunk_len]
+            quiet = int(np.argmin(frame_energy(window)))
+            cut = chunk_len - search + quiet * FRAME
+            if has_voice(buffer[:cut], threshold):
+                yield Chunk(offset / SAMPLE_RATE, (offset + cut) / SAMPLE_RATE,
+                            buffer[:cut])
+            step = max(cut - overlap, 1)
+            buffer = buffer[step:]
+            offset += step
+        pending, size = [buffer], len(buffer)
+    if size:
+        buffer = np.concatenate(pending)
+        if has_voice(buffer, threshold):
+            yield Chunk(offset / SAMPLE_RATE,
+                        (offset + len(buffer)) / SAMPLE_RATE, buffer)
@@ -0,0 +1,201 @@
+"""
+Offline bulk processing.
+
+Run the text and image processors over a JSONL, CSV or Parquet file without
+going through HTTP:
+
+```
+python -m app.cli classifier texts.parquet results.jsonl --field text
+python -m app.cli detect-object images.csv results.jsonl --field path
+```
+
+Input rows are read in windows of `--window` rows. Each window is sorted by
+length, cut into batches of `--batch-size` and spread over `--workers`
+processes. Results are appended to the output in input order, and a
+checkpoint is written next to the output after each window, so a job
+restarted with the same arguments resumes where it stopped.
+
+A row that fails (a text rejected by `--policy reject`, an unreadable image,
+a missing or null `--field`) gets an `{"index", "error"}` line instead of
+stopping the job.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from app.logger import logger
+from app.text.length import LengthPolicy, TextTooLongError
+
+TEXT_TASKS = {
+    "classifier": "classify",
+    "sentiment-analyzer": "analyze_sentiment",
+}
+IMAGE_TASKS = {
+    "image-classify": "classify",
+    "detect-object": "detect",
+}
+
+
+def read_rows(path: str):
+    """Stream rows of a JSONL, CSV or Parquet file as dicts."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except (ImportError, ):
+            sys.exit("reading parquet files requires pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+    elif ext == ".csv":
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def init_worker(threads: int):
+    import torch
+    torch.set_num_threads(threads)
+
+
+def infer(task: str, inputs: list, batch_size: int, policy: str) -> list:
+    if task in TEXT_TASKS:
+        from app.text import processors
+        func = getattr(processors, TEXT_TASKS[task])
+        coro = func(inputs,
+                    policy=LengthPolicy(policy),
+                    batch_size=batch_size)
+    else:
+        from PIL import Image
+        from app.image import processor
+        func = getattr(processor, IMAGE_TASKS[task])
+        images = [Image.open(path).convert("RGB") for path in inputs]
+        coro = func(images, batch_size=batch_size)
+    return asyncio.run(coro)
+
+
+def describe(exc: Exception) -> str:
+    if isinstance(exc, TextTooLongError):
+        return f"text above {exc.max_tokens} tokens"
+    return f"{type(exc).__name__}: {exc}"
+
+
+def run_batch(task: str, inputs: list, batch_size: int, policy: str) -> list:
+    """
+    Run one batch in a worker process, where pipelines are cached.
+
+    Returns a `(result, error)` pair per input. When the batch fails, its
+    inputs are run one by one so that only the failing ones get an error.
+    Errors are returned as text rather than raised, as exceptions don't all
+    survive the trip back from the worker.
+    """
+    try:
+        results = infer(task, inputs, batch_size, policy)
+        return [(result, None) for result in results]
+    except (Exception, ) as exc:
+        if len(inputs) == 1:
+            logger.error(exc)
+            return [(None, describe(exc))]
+    return [run_batch(task, [x], 1, policy)[0] for x in inputs]
+
+
+class Checkpoint:
+    """Count of input rows done and matching output size, written
+    atomically after each window."""
+
+    def __init__(self, output: str):
+        self.path = f"{output}.ckpt"
+        self.rows, self.offset = 0, 0
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            self.rows, self.offset = state["rows"], state["offset"]
+
+    def save(self, rows: int, offset: int):
+        self.rows, self.offset = rows, offset
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"rows": rows, "offset": offset}, f)
+        os.replace(tmp, self.path)
+
+
+def process(args):
+    checkpoint = Checkpoint(args.output)
+    if checkpoint.rows:
+        logger.info(f"resuming after {checkpoint.rows} rows")
+    rows = islice(read_rows(args.input), checkpoint.rows, None)
+    index = checkpoint.rows
+    threads = max((os.cpu_count() or 1) // args.workers, 1)
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             initializer=init_worker,
+                             initargs=(threads, )) as pool, \
+            open(args.output, "a+b") as out:
+        # drop results written after the last checkpoint
+        out.truncate(checkpoint.offset)
+        while window := list(islice(rows, args.window)):
+            inputs = [row.get(args.field) for row in window]
+            # rows missing the field get an error line, without a batch
+            missing = (None, f"missing field {args.field!r}")
+            results = [missing if x is None else None for x in inputs]
+            order = sorted((i for i, x in enumerate(inputs) if x is not None),
+                           key=lambda i: len(str(inputs[i])))
+            batches = [
+                order[i:i + args.batch_size]
+                for i in range(0, len(order), args.batch_size)
+            ]
+            futures = [
+                pool.submit(run_batch, args.task, [inputs[i] for i in batch],
+                            args.batch_size, args.policy)
+                for batch in batches
+            ]
+            for batch, future in zip(batches, futures):
+                for i, result in zip(batch, future.result()):
+                    results[i] = result
+            for row, (result, error) in zip(window, results):
+                if error is None:
+                    line = {"index": index, "result": result}
+                else:
+                    line = {"index": index, "error": error}
+                if args.id_field:
+                    line["id"] = row.get(args.id_field)
+                out.write(json.dumps(line).encode() + b"\n")
+                index += 1
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint.save(index, out.tell())
+            logger.info(f"{index} rows done")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli",
+                                     description="Offline bulk processing.")
+    parser.add_argument("task", choices=[*TEXT_TASKS, *IMAGE_TASKS])
+    parser.add_argument("input", help="JSONL, CSV or Parquet file")
+    parser.add_argument("output", help="JSONL results file")
+    parser.add_argument("--field",
+                        default="text",
+                        help="input column holding the text or image path")
+    parser.add_argument("--id-field", help="input column copied to results")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--window",
+                        type=int,
+                        default=4096,
+                        help="rows read, sorted and checkpointed together")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--policy",
+                        choices=[p.value for p in LengthPolicy],
+                        default=LengthPolicy.truncate.value,
+                        help="handling of texts above the model limit")
+    process(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,24 @@
+from concurrent.futures.process import BrokenProcessPool
 from typing import Annotated, List
 
-from fastapi import FastAPI, Form, HTTPException, UploadFile
+import pytesseract
+from fastapi import Depends, FastAPI, Form, HTTPException, UploadFile
 from fastapi_redis_cache import cache
-from pdf2image import convert_from_bytes
-from PIL import Image
+from pdf2image.exceptions import (PDFInfoNotInstalledError, PDFPageCountError,
+                                  PDFPopplerTimeoutError, PDFSyntaxError,
+                                  PopplerNotInstalledError)
+from PIL import UnidentifiedImageError
 from pydantic import BaseModel
 
+from app import ocr
+from app.admission import admit
 from app.document import processor
 from app.logger import logger
-from app.response import ApiResponse
+from app.response import ApiJSONResponse, ApiResponse, respond
 from app.settings import settings
 
-app = FastAPI(title="Document processing app")
+app = FastAPI(title="Document processing app",
+              default_response_class=ApiJSONResponse)
 
 CONTENT_TYPE_PDF = "application/pdf"
 
@@ -71,7 +78,9 @@ def desc():
     return ApiResponse(data={"desc": "Document processing app"})
 
 
-@app.post("/answer-questions", response_model=DocumentQuestionAnswerResponse)
+@app.post("/answer-questions",
+          response_model=DocumentQuestionAnswerResponse,
+          dependencies=[Depends(admit("document/answer-questions"))])
 async def answer_questions(payload: UploadFile, questions: Annotated[str,
                                                                      Form()]):
     """
@@ -80,6 +89,10 @@ async def answer_questions(payload: UploadFile, questions: Annotated[str,
     This endpoint takes an uploaded document file and a list of questions. It processes the document
     to find answers to the questions.
 
+    PDF pages are read from their embedded text layer when they have one; other pages and images
+    are preprocessed (downscaled, binarized, deskewed) and OCRed in parallel in a process pool.
+    Up to `LK_DOCUMENT_MAX_PAGES` pages are searched and each question keeps its best answer.
+
     Parameters:
     - **payload**: The uploaded document file.
     - **questions**: A comma-separated list of questions.
@@ -125,19 +138,23 @@ async def answer_questions(payload: UploadFile, questions: Annotated[str,
     ```
     """
     payload = validate_file(payload)
-    img = None
-    if payload.content_type == CONTENT_TYPE_PDF:
-        img_list = None
-        try:
-            img_list = convert_from_bytes(payload.file.read(),
-                                          single_file=True)
-        except (ValueError) as exc:
-            logger.error(exc)
-            raise HTTPException(status_code=500,
-                                detail="error while processing document")
-        img = img_list[0]
-    else:
-        img = Image.open(payload.file)
-
-    result = await processor.answer_question(img, questions.split(','))
-    return DocumentQuestionAnswerResponse(data=result)
+    data = payload.file.read()
+    try:
+        if payload.content_type == CONTENT_TYPE_PDF:
+            pages = await ocr.pdf_word_boxes(data)
+        else:
+            pages = await ocr.image_word_boxes(data)
+    except (ValueError, PDFPageCountError, PDFSyntaxError,
+            PDFPopplerTimeoutError, UnidentifiedImageError,
+            pytesseract.TesseractError) as exc:
+        logger.error(exc)
+        raise HTTPException(status_code=500,
+                            detail="error while processing document")
+    except (OSError, PDFInfoNotInstalledError, PopplerNotInstalledError,
+            BrokenProcessPool) as exc:
+        # missing tesseract or poppler binaries, or a dead OCR worker
+        logger.error(exc)
+        raise HTTPException(status_code=503, detail="ocr unavailable")
+
+    result = await processor.answer_question(pages, questions.split(','))
+    return respond(DocumentQuestionAnswerResponse, result)
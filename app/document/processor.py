@@ -1,14 +1,31 @@
-from transformers import pipeline
+from app import startup
 
 
-async def answer_question(doc, questions):
-    pipe = pipeline("document-question-answering",
-                    model="impira/layoutlm-document-qa")
+def get_pipeline():
+    return startup.get_pipeline("document-question-answering",
+                                "impira/layoutlm-document-qa")
+
+
+async def answer_question(pages, questions):
+    """
+    Answer questions from the words of a document.
+
+    `pages` holds one list of normalized `(word, box)` pairs per page. LayoutLM
+    only reads words and their layout, so no image is handed to the pipeline.
+    Each question keeps its best answer across pages.
+    """
+    pipe = get_pipeline()
     result = []
     for question in questions:
-        out = pipe(doc, question)
-        if not out:
+        best = None
+        for word_boxes in pages:
+            if not word_boxes:
+                continue
+            out = pipe(None, question, word_boxes=word_boxes)
+            if out and (best is None or out[0]["score"] > best["score"]):
+                best = out[0]
+        if best is None:
             continue
-        out[0]["question"] = question
-        result.append(out[0])
+        best["question"] = question
+        result.append(best)
     return result
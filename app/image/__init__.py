@@ -1,16 +1,18 @@
 import base64
 from io import BytesIO
 
-from fastapi import FastAPI, UploadFile, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, UploadFile
 from fastapi_redis_cache import cache
 from PIL import Image
 from pydantic import BaseModel
 
+from app.admission import admit
 from app.image import processor
-from app.response import ApiResponse
+from app.response import ApiJSONResponse, ApiResponse, respond
 from app.settings import settings
 
-app = FastAPI(title="Image processing app")
+app = FastAPI(title="Image processing app",
+              default_response_class=ApiJSONResponse)
 
 
 class ClassifierOutput(BaseModel):
@@ -82,7 +84,9 @@ async def desc():
     return ApiResponse(data={"app": "image"})
 
 
-@app.post("/classify", response_model=ClassifyResponse)
+@app.post("/classify",
+          response_model=ClassifyResponse,
+          dependencies=[Depends(admit("image/classify"))])
 @cache(expire=30)
 async def classify(payload: UploadFile):
     """
@@ -108,12 +112,18 @@ async def classify(payload: UploadFile):
     """
     img = uploadfile_to_pil(payload)
     result = await processor.classify(img)
-    return ClassifyResponse(data=result)
+    return respond(ClassifyResponse, result)
 
 
-@app.post("/detect-object", response_model=DetectObjectResponse)
+@app.post("/detect-object",
+          response_model=DetectObjectResponse,
+          dependencies=[Depends(admit("image/detect-object"))])
 @cache(expire=30)
-async def detect_object(payload: UploadFile):
+async def detect_object(payload: UploadFile,
+                        tiled: bool = False,
+                        tile_size: int = Query(800, ge=128, le=2048),
+                        overlap: float = Query(0.2, ge=0, lt=1),
+                        iou_threshold: float = Query(0.5, gt=0, le=1)):
     """
     Object detection.
 
@@ -121,6 +131,11 @@ async def detect_object(payload: UploadFile):
 
     Parameters:
     - **payload**: The uploaded image file.
+    - **tiled**: Detect on overlapping tiles of the full resolution image, so small
+      objects of large images don't vanish when the image is resized for the model.
+    - **tile_size**: Tile width and height in pixels, in tiled mode.
+    - **overlap**: Overlap between neighbouring tiles, as a fraction of `tile_size`.
+    - **iou_threshold**: Boxes of the same label overlapping more than this are merged.
 
     Returns:
     - **DetectObjectResponse**: A response containing object detection results for the uploaded image.
@@ -136,11 +151,21 @@ async def detect_object(payload: UploadFile):
     ```
     """
     img = uploadfile_to_pil(payload)
-    result = await processor.detect(img)
-    return DetectObjectResponse(data=result)
-
-
-@app.post("/segment", response_model=SegmentResponse)
+    if tiled:
+        result = await processor.detect_tiled(
+            img,
+            tile_size=tile_size,
+            overlap=overlap,
+            iou_threshold=iou_threshold,
+            batch_size=settings.IMAGE_BATCH_SIZE)
+    else:
+        result = await processor.detect(img)
+    return respond(DetectObjectResponse, result)
+
+
+@app.post("/segment",
+          response_model=SegmentResponse,
+          dependencies=[Depends(admit("image/segment"))])
 @cache(expire=30)
 async def segment(payload: UploadFile):
     """
@@ -176,6 +201,6 @@ async def segment(payload: UploadFile):
         pil_img.save(buf, format=img_format)
         result.append({
             "label": segment["label"],
-            "image": base64.b64encode(buf.getvalue())
+            "image": base64.b64encode(buf.getvalue()).decode()
         })
-    return SegmentResponse(data=result)
+    return respond(SegmentResponse, result)
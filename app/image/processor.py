@@ -1,18 +1,138 @@
-from transformers import pipeline
+from app.startup import get_pipeline
 
+CLASSIFIER = ("image-classification", "microsoft/resnet-50")
+DETECTOR = ("object-detection", "facebook/detr-resnet-50")
 
-async def classify(img):
-    pipe = pipeline("image-classification", model="microsoft/resnet-50")
-    result = pipe(img)
+
+async def classify(img, batch_size=1):
+    pipe = get_pipeline(*CLASSIFIER)
+    result = pipe(img, batch_size=batch_size)
     return result
 
 
-async def detect(img):
-    pipe = pipeline("object-detection", model="facebook/detr-resnet-50")
-    return pipe(img)
+async def detect(img, batch_size=1):
+    pipe = get_pipeline(*DETECTOR)
+    return pipe(img, batch_size=batch_size)
+
+
+def tile_boxes(width, height, tile_size, overlap):
+    """Cut a `width` x `height` image into `tile_size` tiles overlapping by
+    `overlap` (a fraction of the tile size). Edge tiles are shifted inwards
+    so that every tile keeps the full size."""
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        step = max(int(tile_size * (1 - overlap)), 1)
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]
+
+    return [(left, top, min(left + tile_size, width),
+             min(top + tile_size, height)) for top in starts(height)
+            for left in starts(width)]
+
+
+def iou(a, b):
+    width = min(a["xmax"], b["xmax"]) - max(a["xmin"], b["xmin"])
+    height = min(a["ymax"], b["ymax"]) - max(a["ymin"], b["ymin"])
+    if width <= 0 or height <= 0:
+        return 0.0
+    inter = width * height
+    area_a = (a["xmax"] - a["xmin"]) * (a["ymax"] - a["ymin"])
+    area_b = (b["xmax"] - b["xmin"]) * (b["ymax"] - b["ymin"])
+    return inter / (area_a + area_b - inter)
+
+
+def intersection_over_smaller(a, b):
+    width = min(a["xmax"], b["xmax"]) - max(a["xmin"], b["xmin"])
+    height = min(a["ymax"], b["ymax"]) - max(a["ymin"], b["ymin"])
+    if width <= 0 or height <= 0:
+        return 0.0
+    area_a = (a["xmax"] - a["xmin"]) * (a["ymax"] - a["ymin"])
+    area_b = (b["xmax"] - b["xmin"]) * (b["ymax"] - b["ymin"])
+    return width * height / max(min(area_a, area_b), 1e-9)
+
+
+def nms(detections, iou_threshold, key=None, overlap=None):
+    """
+    Greedy non-maximum suppression, per label.
+
+    Detections are visited by decreasing score, or by `key`, and dropped when
+    their `overlap(kept, detection)` (IoU of the boxes by default) with a kept
+    detection of the same label is above `iou_threshold`.
+    """
+    key = key or (lambda d: -d["score"])
+    overlap = overlap or (lambda a, b: iou(a["box"], b["box"]))
+    kept = []
+    for detection in sorted(detections, key=key):
+        if all(k["label"] != detection["label"]
+               or overlap(k, detection) <= iou_threshold for k in kept):
+            kept.append(detection)
+    return kept
+
+
+def touches_inner_edge(box, tile, width, height, margin=2):
+    """Whether a box, in tile coordinates, touches a tile edge that is not an
+    image edge, i.e. whether the object may be cut by the tile."""
+    left, top, right, bottom = tile
+    return ((left > 0 and box["xmin"] <= margin)
+            or (top > 0 and box["ymin"] <= margin)
+            or (right < width and box["xmax"] >= right - left - margin)
+            or (bottom < height and box["ymax"] >= bottom - top - margin))
+
+
+async def detect_tiled(img,
+                       tile_size=800,
+                       overlap=0.2,
+                       iou_threshold=0.5,
+                       batch_size=8):
+    """
+    Detect small objects in high resolution images.
+
+    The image is cut into overlapping tiles at model resolution, tiles are run
+    in batches along with the whole image (for objects larger than a tile),
+    boxes are mapped back to image coordinates and duplicates found in
+    overlapping tiles are merged by non-maximum suppression.
+
+    An object crossing a tile edge gives a clipped box in that tile and a full
+    box in a neighbour tile or in the whole image pass, and their IoU is often
+    low. So boxes touching an inner tile edge are visited last, and they are
+    merged on intersection over the smaller box instead of IoU.
+    """
+    pipe = get_pipeline(*DETECTOR)
+    tiles = tile_boxes(img.width, img.height, tile_size, overlap)
+    if len(tiles) > 1:
+        tiles.append((0, 0, img.width, img.height))
+    # crops are generated lazily, so only a batch of tiles is in memory
+    inputs = (img.crop(tile) for tile in tiles)
+    outputs = pipe(inputs, batch_size=batch_size)
+    detections, clipped = [], set()
+    for tile, objects in zip(tiles, outputs):
+        left, top = tile[:2]
+        for obj in objects:
+            box = obj["box"]
+            if touches_inner_edge(box, tile, img.width, img.height):
+                clipped.add(id(obj))
+            obj["box"] = {
+                "xmin": box["xmin"] + left,
+                "ymin": box["ymin"] + top,
+                "xmax": box["xmax"] + left,
+                "ymax": box["ymax"] + top,
+            }
+            detections.append(obj)
+
+    def overlap(a, b):
+        if id(a) in clipped or id(b) in clipped:
+            return intersection_over_smaller(a["box"], b["box"])
+        return iou(a["box"], b["box"])
+
+    return nms(detections,
+               iou_threshold,
+               key=lambda d: (id(d) in clipped, -d["score"]),
+               overlap=overlap)
 
 
 async def segment(img):
-    pipe = pipeline("image-segmentation",
-                    model="nvidia/segformer-b0-finetuned-ade-512-512")
+    pipe = get_pipeline("image-segmentation",
+                        "nvidia/segformer-b0-finetuned-ade-512-512")
     return pipe(img)
@@ -0,0 +1,81 @@
+import os
+
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+
+from fastapi_redis_cache import FastApiRedisCache
+
+from app import metrics, startup
+from app.admission import controller as admission_controller
+from app.logger import logger
+from app.response import ApiJSONResponse, ApiResponse
+from app.settings import settings
+from app.middleware import LoggingMiddleware
+from app.profiling import ProfilingMiddleware
+
+
+def get_app():
+    return FastAPI(
+        debug=settings.DEBUG,
+        title="LokingAI",
+        version="0.0.1",
+        default_response_class=ApiJSONResponse,
+    )
+
+
+app = get_app()
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+# app.add_middleware(LoggingMiddleware)
+
+# Sub-apps are imported on demand so that a worker only pays for the model
+# stacks it serves.
+APPS = ("audio", "document", "image", "text", "video")
+
+
+def enabled_apps(entries: list[str]) -> list[str]:
+    """Names of the sub-apps listed in `LK_APPS`, e.g. `text, image`."""
+    names = [name.strip() for name in entries if name.strip()]
+    unknown = sorted(set(names) - set(APPS))
+    if unknown:
+        raise ValueError(f"unknown apps in LK_APPS: {', '.join(unknown)} "
+                         f"(expected some of {', '.join(APPS)})")
+    return list(dict.fromkeys(names))
+
+
+for name in enabled_apps(settings.APPS):
+    app.mount(f"/{name}", startup.import_module(f"app.{name}").app)
+
+if settings.ADMIN_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+    app.mount("/admin", startup.import_module("app.admin").app)
+
+
+@app.get("/admission", response_model=ApiResponse)
+def admission_stats():
+    return ApiResponse(data=admission_controller.snapshot())
+
+
+@app.get("/metrics", response_model=ApiResponse)
+def metrics_report():
+    return ApiResponse(data=metrics.snapshot())
+
+
+@app.get("/startup", response_model=ApiResponse)
+def startup_report():
+    return ApiResponse(data=startup.report)
+
+
+@app.on_event("startup")
+def app_startup():
+    logger.info("startup report", extra=startup.report)
+    redis_cache = FastApiRedisCache()
+    redis_cache.init(host_url=os.environ.get("REDIS_URL", settings.REDIS_URL),
+                     prefix=f"{settings.NAME}-cache",
+                     response_header=f"X-{settings.NAME}-Cache",
+                     ignore_arg_types=[Request, Response])
@@ -0,0 +1,72 @@
+"""Audio and video uploads, decoded in a stream with PyAV."""
+import shutil
+import tempfile
+from typing import BinaryIO, Iterator
+
+import av
+from fastapi import HTTPException, UploadFile
+
+from app.logger import logger
+from app.response import dumps
+
+
+def validate_file(file: UploadFile, content_types: list[str],
+                  max_size: int) -> UploadFile:
+    if file.content_type not in content_types:
+        raise HTTPException(status_code=400, detail="invalid file type")
+    if file.size / (1024 * 1024) > max_size:
+        raise HTTPException(status_code=400, detail="file size above limit")
+    return file
+
+
+def probe(file: BinaryIO, kind: str):
+    """
+    Check that `file` holds a decodable `kind` (`audio` or `video`) track,
+    then rewind it.
+
+    Raises `av.FFmpegError` on unreadable data and `IndexError` when there is
+    no such track.
+    """
+    with av.open(file) as container:
+        stream = getattr(container.streams, kind)[0]
+        next(container.decode(stream), None)
+    file.seek(0)
+
+
+def open_upload(file: UploadFile, kind: str, content_types: list[str],
+                max_size: int) -> BinaryIO:
+    """
+    Validate an upload and copy it to a temporary file owned by the caller.
+
+    The upload is closed once the route returns, before a streamed response
+    is sent, hence the copy. The copy is probed, so that unreadable files are
+    rejected with 400 before a streamed response commits to 200.
+    """
+    validate_file(file, content_types, max_size)
+    media = tempfile.TemporaryFile()
+    shutil.copyfileobj(file.file, media)
+    media.seek(0)
+    try:
+        probe(media, kind)
+    except (av.FFmpegError, IndexError):
+        media.close()
+        raise HTTPException(status_code=400, detail=f"invalid {kind} file")
+    return media
+
+
+def ndjson(media: BinaryIO, kind: str,
+           lines: Iterator[dict]) -> Iterator[bytes]:
+    """
+    Serialize `lines` decoded from `media` as NDJSON, then close `media`.
+
+    This is a sync generator, so Starlette iterates it in its threadpool and
+    decoding doesn't block the event loop. Headers are sent by then, so data
+    corrupted past the probed start ends the stream with an `error` line.
+    """
+    with media:
+        try:
+            for line in lines:
+                yield dumps(line) + b"\n"
+        except (av.FFmpegError, ) as exc:
+            logger.error(exc)
+            yield dumps({"error": f"invalid {kind} data"}) + b"\n"
@@ -0,0 +1,22 @@
+from collections import Counter, defaultdict
+
+dedup = defaultdict(Counter)
+
+
+def record_dedup(task: str, texts: int, unique: int, inferred: int):
+    """Count texts received, unique after normalization, and sent to the
+    model after the cache lookup."""
+    dedup[task].update(texts=texts, unique=unique, inferred=inferred)
+
+
+def snapshot() -> dict:
+    return {
+        "dedup": {
+            task: {
+                **counts,
+                "dedup_ratio": 1 - counts["unique"] / counts["texts"],
+                "model_ratio": counts["inferred"] / counts["texts"],
+            }
+            for task, counts in dedup.items() if counts["texts"]
+        }
+    }
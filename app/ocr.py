@@ -0,0 +1,202 @@
+"""
+OCR of document pages for document question answering.
+
+This module lives outside of the `app.document` sub-app because its functions
+run in pool workers, which import it and must not build the web app.
+"""
+import asyncio
+import multiprocessing
+import subprocess
+import tempfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import pytesseract
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+from PIL import Image
+
+from app.logger import logger
+from app.settings import settings
+
+_pool = None
+_page_slots = asyncio.Semaphore(settings.OCR_PAGE_CONCURRENCY)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """OCR worker pool. Workers are started from a fork server, not forked
+    from the web worker, which holds threads (torch, streamers) that a fork
+    would copy in an undefined state."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.OCR_WORKERS or None,
+            mp_context=multiprocessing.get_context("forkserver"))
+    return _pool
+
+
+def normalize_box(box, width, height) -> list[int]:
+    """Scale a pixel/point box to the 0-1000 range LayoutLM expects."""
+    xmin, ymin, xmax, ymax = box
+    return [
+        int(1000 * xmin / width),
+        int(1000 * ymin / height),
+        int(1000 * xmax / width),
+        int(1000 * ymax / height),
+    ]
+
+
+def otsu_threshold(pixels: np.ndarray) -> int:
+    hist = np.bincount(pixels.ravel(), minlength=256) / pixels.size
+    omega = np.cumsum(hist)
+    mu = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu)**2 / (omega * (1 - omega))
+    if np.isnan(between).all():
+        # a single gray level, as in a blank page
+        return 127
+    return int(np.nanargmax(between))
+
+
+def binarize(img: Image.Image) -> Image.Image:
+    threshold = otsu_threshold(np.asarray(img))
+    return img.point(lambda p: 255 if p > threshold else 0)
+
+
+def skew_angle(img: Image.Image, max_angle=5.0, step=0.5) -> float:
+    """
+    Estimate the skew of a binarized page with a projection profile.
+
+    Text lines are horizontal when the rows ink counts are the most
+    contrasted, so the rotation maximizing their variance is kept.
+    """
+    small = img.copy()
+    small.thumbnail((800, 800))
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step, step):
+        rotated = small.rotate(angle, fillcolor=255)
+        score = np.var((np.asarray(rotated) < 128).sum(axis=1))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess(img: Image.Image, dpi: float | None = None) -> Image.Image:
+    """
+    Downscale to the target DPI, binarize and deskew a page.
+
+    Images without DPI metadata (most photos) are downscaled so that their
+    longest side fits `LK_OCR_MAX_SIDE` pixels, which is also enforced on top
+    of the DPI.
+    """
+    img = img.convert("L")
+    scale = 1.0
+    if dpi and dpi > settings.OCR_DPI:
+        scale = settings.OCR_DPI / dpi
+    scale = min(scale, settings.OCR_MAX_SIDE / max(img.width, img.height))
+    if scale < 1:
+        img = img.resize((round(img.width * scale), round(img.height * scale)),
+                         Image.LANCZOS)
+    img = binarize(img)
+    angle = skew_angle(img)
+    if angle:
+        img = img.rotate(angle, expand=True, fillcolor=255)
+    return img
+
+
+def ocr(img: Image.Image) -> list:
+    """Run tesseract and return normalized `(word, box)` pairs."""
+    data = pytesseract.image_to_data(img,
+                                     lang=settings.OCR_LANG,
+                                     output_type=pytesseract.Output.DICT)
+    word_boxes = []
+    for i, word in enumerate(data["text"]):
+        if not word.strip():
+            continue
+        box = (data["left"][i], data["top"][i],
+               data["left"][i] + data["width"][i],
+               data["top"][i] + data["height"][i])
+        word_boxes.append((word, normalize_box(box, img.width, img.height)))
+    return word_boxes
+
+
+def ocr_image(data: bytes) -> list:
+    """OCR an image file. Runs in the pool, which is handed the raw bytes so
+    that the image is decoded there rather than while pickling it."""
+    img = Image.open(BytesIO(data))
+    dpi = img.info.get("dpi", (None, ))[0]
+    return ocr(preprocess(img, dpi))
+
+
+def ocr_pdf_page(data: bytes, page: int) -> list:
+    img = convert_from_bytes(data,
+                             dpi=settings.OCR_DPI,
+                             first_page=page,
+                             last_page=page,
+                             grayscale=True)[0]
+    return ocr(preprocess(img))
+
+
+def pdf_text_layer(data: bytes, pages: int) -> list[list]:
+    """
+    Read the words and boxes of the text layer embedded in a PDF.
+
+    Returns one list of normalized `(word, box)` pairs per page, empty for
+    pages without text (scanned pages).
+    """
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(data)
+        tmp.flush()
+        proc = subprocess.run(
+            ["pdftotext", "-bbox", "-f", "1", "-l",
+             str(pages), tmp.name, "-"],
+            capture_output=True)
+    if proc.returncode != 0:
+        logger.warning(f"pdftotext failed: {proc.stderr.decode()}")
+        return [[] for _ in range(pages)]
+    result = []
+    for page in ET.fromstring(proc.stdout).iter():
+        if not page.tag.endswith("page"):
+            continue
+        width, height = float(page.get("width")), float(page.get("height"))
+        words = []
+        for word in page:
+            if not word.text or not word.text.strip():
+                continue
+            box = [
+                float(word.get(k)) for k in ("xMin", "yMin", "xMax", "yMax")
+            ]
+            words.append((word.text, normalize_box(box, width, height)))
+        result.append(words)
+    return result + [[] for _ in range(pages - len(result))]
+
+
+async def run_in_pool(func, *args):
+    async with _page_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_pool(), func, *args)
+
+
+async def pdf_word_boxes(data: bytes) -> list[list]:
+    """
+    Extract the words of each page of a PDF.
+
+    Pages with an embedded text layer are read directly; the others are
+    rasterized and OCRed in the process pool, up to `OCR_PAGE_CONCURRENCY`
+    pages at a time.
+    """
+    info = await asyncio.to_thread(pdfinfo_from_bytes, data)
+    pages = min(info["Pages"], settings.DOCUMENT_MAX_PAGES)
+    layer = await asyncio.to_thread(pdf_text_layer, data, pages)
+    tasks = []
+    for page, words in enumerate(layer, start=1):
+        if words:
+            tasks.append(asyncio.sleep(0, result=words))
+        else:
+            tasks.append(run_in_pool(ocr_pdf_page, data, page))
+    return await asyncio.gather(*tasks)
+
+
+async def image_word_boxes(data: bytes) -> list[list]:
+    return [await run_in_pool(ocr_image, data)]
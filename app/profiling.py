@@ -0,0 +1,208 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+from app.logger import logger
+
+
+def frame_stack(frame) -> str:
+    """Collapse a frame stack, root first, as flamegraph tools expect."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                     f":{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class ProfileSession:
+    """
+    Sample the Python stacks of every thread and, optionally, record torch
+    operators, for `seconds` or until `requests` requests are served.
+
+    Model calls are wrapped in a torch `record_function` range named after the
+    model (see `Traced`), opened on the thread that runs the inference, so
+    operators can be broken down per model.
+    """
+
+    def __init__(self,
+                 seconds: float | None = None,
+                 requests: int | None = None,
+                 interval: float = 0.005,
+                 torch_profile: bool = True):
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.remaining = requests
+        self.interval = interval
+        self.samples = Counter()
+        self.ranges = set()
+        self.started = time.time()
+        self.stopped = None
+        self._done = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._torch = None
+        if torch_profile:
+            import torch
+            self._torch = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU])
+
+    def start(self):
+        if self._torch is not None:
+            self._torch.__enter__()
+        self._sampler.start()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._done.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self.samples[frame_stack(frame)] += 1
+            if self.deadline and time.monotonic() > self.deadline:
+                self._done.set()
+
+    def record(self, name: str):
+        if self._torch is None or self._done.is_set():
+            return nullcontext()
+        import torch
+        self.ranges.add(name)
+        return torch.profiler.record_function(name)
+
+    def request_done(self):
+        if self.remaining is not None:
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self._done.set()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def stop(self):
+        """Stop sampling and torch recording. Must run on the thread that
+        called `start`, which is the event loop."""
+        if self.stopped:
+            return
+        self._done.set()
+        self._sampler.join()
+        if self._torch is not None:
+            self._torch.__exit__(None, None, None)
+        self.stopped = time.time()
+        logger.info("profiling stopped",
+                    extra={"duration": self.stopped - self.started})
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}"
+                         for stack, count in self.samples.most_common())
+
+    def operators(self, limit: int = 20) -> dict:
+        """Self CPU time and calls of torch operators, grouped by the model
+        they ran under. Operators run outside of any model call are grouped
+        under `other`."""
+        if self._torch is None:
+            return {}
+        totals = {}
+        for event in self._torch.events():
+            if event.name in self.ranges:
+                continue
+            parent = event.cpu_parent
+            while parent is not None and parent.name not in self.ranges:
+                parent = parent.cpu_parent
+            name = parent.name if parent is not None else "other"
+            ops = totals.setdefault(name, {})
+            calls, cpu = ops.get(event.name, (0, 0.0))
+            ops[event.name] = (calls + 1, cpu + event.self_cpu_time_total)
+        return {
+            name: [{
+                "op": op,
+                "calls": calls,
+                "self_cpu_ms": round(cpu / 1000, 3)
+            } for op, (calls, cpu) in sorted(
+                ops.items(), key=lambda item: -item[1][1])[:limit]]
+            for name, ops in totals.items()
+        }
+
+    def result(self) -> dict:
+        return {
+            "running": not self.stopped,
+            "started": self.started,
+            "stopped": self.stopped,
+            "samples": sum(self.samples.values()),
+            "collapsed": self.collapsed(),
+            "operators": self.operators() if self.stopped else {},
+        }
+
+
+session: ProfileSession | None = None
+
+
+def record(name: str):
+    """Open a torch range named `name` in the running session, on the calling
+    thread. A no-op while profiling is off."""
+    current = session
+    if current is None or current.stopped:
+        return nullcontext()
+    return current.record(name)
+
+
+class Traced:
+    """
+    Wrap a model so that its calls run in a range named after the model.
+
+    Inference runs on the event loop, in the threadpool or in a generation
+    thread depending on the route, and torch ranges are per thread, so the
+    range is opened around each call rather than around the request. Calls
+    to `target` itself and to its `methods` are recorded, other attributes
+    are passed through.
+    """
+
+    def __init__(self, target, name: str, methods: tuple = ()):
+        self._target = target
+        self._name = name
+        self._methods = methods
+
+    def _recorded(self, func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with record(self._name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if attr in self._methods:
+            return self._recorded(value)
+        return value
+
+    def __call__(self, *args, **kwargs):
+        return self._recorded(self._target)(*args, **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    Count HTTP requests served by the running profile session, and stop it
+    once it is done.
+
+    Without a session, requests go straight through, so profiling costs
+    nothing while it is off.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        current = session
+        if (current is None or current.stopped or scope["type"] != "http"
+                or scope["path"].startswith("/admin")):
+            return await self.app(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current.request_done()
+            if current.finished:
+                current.stop()
@@ -1,7 +1,13 @@
 from typing import Any
 
+import orjson
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
+from app.settings import settings
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
 
 class ApiResponse(BaseModel):
     error: str | None = None
@@ -10,3 +16,37 @@ class ApiResponse(BaseModel):
 
 class ApiResponseList(ApiResponse):
     data: list[Any] = None
+
+
+def default(obj):
+    """Serialize what orjson doesn't know natively: torch tensors (and
+    scalars), numpy types it skips, and pydantic models."""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=default, option=OPTIONS)
+
+
+class ApiJSONResponse(JSONResponse):
+    """Default response class of every app, rendered by orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def respond(response_model: type[ApiResponse], data: Any):
+    """
+    Build a route response from trusted model outputs.
+
+    With `VALIDATE_RESPONSES` off, `data` skips pydantic validation and
+    FastAPI's encoding and is serialized by orjson as is. The route
+    `response_model` still documents the schema.
+    """
+    if settings.VALIDATE_RESPONSES:
+        return response_model(data=data)
+    return ApiJSONResponse({"error": None, "data": data})
@@ -4,19 +4,124 @@ _image_content_types = [
     "image/jpeg", "image/png", "image/gif", "image/svg+xml"
 ]
 
+_admission_slos = [
+    "audio/transcribe=60",
+    "text/classifier=1",
+    "text/sentiment-analyzer=1",
+    "text/mask-filler=1",
+    "text/summarizer=20",
+    "text/question-answering=5",
+    "text/labelizer=5",
+    "text/similarities-detector=5",
+    "text/embeddings=5",
+    "image/classify=2",
+    "image/detect-object=5",
+    "image/segment=5",
+    "document/answer-questions=30",
+    "video/classify=60",
+    "video/detect-object=120",
+]
+
+# expected service time (seconds) of routes not measured yet
+_admission_priors = [
+    "audio/transcribe=10",
+    "text/classifier=0.05",
+    "text/sentiment-analyzer=0.05",
+    "text/mask-filler=0.05",
+    "text/summarizer=3",
+    "text/question-answering=0.2",
+    "text/labelizer=0.5",
+    "text/similarities-detector=0.2",
+    "text/embeddings=0.2",
+    "image/classify=0.2",
+    "image/detect-object=1",
+    "image/segment=1",
+    "document/answer-questions=3",
+    "video/classify=10",
+    "video/detect-object=20",
+]
+
+_text_max_tokens = [
+    "classifier=512",
+    "sentiment-analyzer=512",
+    "summarizer=1024",
+]
+
+_audio_content_types = [
+    "audio/mpeg", "audio/wav", "audio/x-wav", "audio/flac", "audio/ogg",
+    "audio/webm", "audio/mp4", "audio/x-m4a"
+]
+
+_video_content_types = [
+    "video/mp4", "video/webm", "video/quicktime", "video/x-matroska",
+    "video/x-msvideo"
+]
+
 _settings = {
     "LK_NAME": ("LokingAI", str),
     "LK_DEBUG": (False, bool),
     "LK_LOG_LEVEL": ("INFO", str),
     "LK_IMAGE_CTYPES": (_image_content_types, list),
     "LK_IMAGE_MAXSIZE": (5, int),  # MB
+    "LK_IMAGE_BATCH_SIZE": (8, int),
     "LK_DOCUMENT_CONTENT_TYPES":
     (_image_content_types + ["application/pdf"], list),
     "LK_DOCUMENT_MAXSIZE": (5, int),  # MB
+    "LK_DOCUMENT_MAX_PAGES": (10, int),
+    "LK_AUDIO_CTYPES": (_audio_content_types, list),
+    "LK_AUDIO_MAXSIZE": (50, int),  # MB
+    "LK_ASR_MODEL": ("openai/whisper-tiny", str),
+    "LK_ASR_BATCH_SIZE": (4, int),
+    "LK_ASR_CHUNK_SECONDS": (20.0, float),
+    "LK_ASR_OVERLAP_SECONDS": (1.0, float),
+    "LK_ASR_VAD_THRESHOLD": (-45.0, float),  # dBFS
+    "LK_VIDEO_CTYPES": (_video_content_types, list),
+    "LK_VIDEO_MAXSIZE": (200, int),  # MB
+    "LK_VIDEO_BATCH_SIZE": (8, int),
+    "LK_VIDEO_DEDUP_DISTANCE": (4, int),  # bits
+    "LK_OCR_WORKERS": (2, int),  # 0 means one per CPU
+    "LK_OCR_PAGE_CONCURRENCY": (4, int),
+    "LK_OCR_DPI": (200, int),
+    "LK_OCR_MAX_SIDE": (2400, int),  # pixels
+    "LK_OCR_LANG": ("eng", str),
     "LK_REDIS_URL": ("redis://127.0.0.1:6379", str),
+    "LK_VALIDATE_RESPONSES": (True, bool),
+    "LK_ADMIN_TOKEN": ("", str),  # empty disables the admin app
+    "LK_APPS": (["audio", "image", "text", "video", "document"], list),
+    "LK_ADMISSION_ENABLED": (True, bool),
+    "LK_ADMISSION_MAX_INFLIGHT": (16, int),
+    "LK_ADMISSION_RESERVED": (4, int),
+    "LK_ADMISSION_HEAVY_THRESHOLD": (0.5, float),  # seconds
+    "LK_ADMISSION_DEFAULT_SLO": (10.0, float),  # seconds
+    "LK_ADMISSION_SLOS": (_admission_slos, list),  # route=seconds
+    "LK_ADMISSION_PRIORS": (_admission_priors, list),  # route=seconds
+    "LK_ADMISSION_DEFER": (0.0, float),  # seconds
+    "LK_TEXT_MAX_TOKENS": (_text_max_tokens, list),  # route=tokens
+    "LK_TEXT_LENGTH_POLICY": ("truncate", str),
+    "LK_TEXT_BATCH_SIZE": (16, int),
+    "LK_TEXT_BATCH_WAIT": (0.005, float),  # seconds
+    "LK_TEXT_WS_MAX_INFLIGHT": (256, int),
+    "LK_TEXT_CACHE_EXPIRE": (3600, int),  # seconds
+    "LK_TEXT_STREAM_TIMEOUT": (60.0, float),  # seconds between fragments
 }
 
 
+def parse_mapping(entries: list[str], cast=str) -> dict:
+    """Parse `key=value` setting entries, skipping the invalid ones."""
+    # settings are loaded before the logger, which reads them
+    from app.logger import logger
+    mapping = {}
+    for entry in entries:
+        key, sep, value = entry.partition("=")
+        try:
+            if not sep:
+                raise ValueError
+            mapping[key.strip()] = cast(value)
+        except (ValueError, ):
+            logger.warning(f"invalid setting entry: {entry}")
+    return mapping
+
+
 class AppSettings:
 
     def __init__(self):
@@ -34,6 +139,11 @@ class AppSettings:
                         val_default = int(val_env)
                     except (ValueError, ):
                         pass
+                elif val_type is float:
+                    try:
+                        val_default = float(val_env)
+                    except (ValueError, ):
+                        pass
                 else:
                     val_default = val_env
 
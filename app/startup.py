@@ -0,0 +1,41 @@
+import importlib
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from functools import cache
+
+from app import profiling
+
+report = {"imports": {}, "models": {}}
+
+
+@contextmanager
+def timed(section: str, name: str):
+    """Record the time, max RSS growth and modules loaded by a block."""
+    modules = len(sys.modules)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        report[section][name] = {
+            "seconds": round(time.perf_counter() - started, 4),
+            "maxrss_kb":
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - maxrss,
+            "modules": len(sys.modules) - modules,
+        }
+
+
+def import_module(name: str):
+    with timed("imports", name):
+        return importlib.import_module(name)
+
+
+@cache
+def get_pipeline(task: str, model: str, **kwargs):
+    """Load a transformers pipeline once per process, recorded in the report
+    and traced under the model name."""
+    from transformers import pipeline
+    with timed("models", model):
+        return profiling.Traced(pipeline(task, model=model, **kwargs), model)
@@ -1,12 +1,75 @@
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+import asyncio
+from contextlib import closing
+
+import orjson
+from fastapi import (Depends, FastAPI, HTTPException, WebSocket,
+                     WebSocketDisconnect)
+from fastapi.responses import Response, StreamingResponse
 from fastapi_redis_cache import cache
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, Field, validator
 
-from app.response import ApiResponse, ApiResponseList
+from app.admission import admit, admitted
+from app.logger import logger
+from app.response import (ApiJSONResponse, ApiResponse, ApiResponseList,
+                          dumps, respond)
+from app.settings import parse_mapping, settings
 from app.text import processors
+from app.text.batcher import MicroBatcher
+from app.text.dedup import run_unique
+from app.text.embeddings import DType, Encoding, quantize, to_base64, to_npy
+from app.text.length import LengthPolicy, TextTooLongError
+
+app = FastAPI(title="Text processing app",
+              default_response_class=ApiJSONResponse)
+
+MAX_TOKENS = parse_mapping(settings.TEXT_MAX_TOKENS, int)
+DEFAULT_POLICY = LengthPolicy(settings.TEXT_LENGTH_POLICY)
+
+
+async def run_classifier(text, policy=DEFAULT_POLICY):
+    return await run_unique("classifier",
+                            processors.classify,
+                            text,
+                            policy,
+                            max_tokens=MAX_TOKENS.get("classifier"),
+                            batch_size=settings.TEXT_BATCH_SIZE)
+
+
+async def run_sentiment_analyzer(text, policy=DEFAULT_POLICY):
+    return await run_unique("sentiment-analyzer",
+                            processors.analyze_sentiment,
+                            text,
+                            policy,
+                            max_tokens=MAX_TOKENS.get("sentiment-analyzer"),
+                            batch_size=settings.TEXT_BATCH_SIZE)
+
+
+def admitted_batches(route: str, func):
+    """Count each websocket batch under the admission of the HTTP `route`
+    serving the same model."""
+
+    async def run(texts):
+        async with admitted(route):
+            return await func(texts)
 
-app = FastAPI(title="Text processing app")
+    return run
+
+
+batchers = {
+    "classifier":
+    MicroBatcher(admitted_batches("text/classifier", run_classifier),
+                 settings.TEXT_BATCH_SIZE, settings.TEXT_BATCH_WAIT),
+    "sentiment-analyzer":
+    MicroBatcher(
+        admitted_batches("text/sentiment-analyzer", run_sentiment_analyzer),
+        settings.TEXT_BATCH_SIZE, settings.TEXT_BATCH_WAIT),
+}
+
+
+@app.exception_handler(TextTooLongError)
+async def text_too_long_handler(request, exc: TextTooLongError):
+    return ApiJSONResponse(status_code=413,
+                           content=ApiResponse(error=str(exc)).dict())
 
 
 class TextRequest(BaseModel):
@@ -19,6 +82,16 @@ class TextRequest(BaseModel):
         return v
 
 
+class SummarizeRequest(TextRequest):
+    max_length: int | None = Field(None, ge=1)
+    min_length: int | None = Field(None, ge=0)
+    num_beams: int | None = Field(None, ge=1)
+    early_stopping: bool | None = None
+
+    def generate_kwargs(self) -> dict:
+        return self.dict(exclude={"text"}, exclude_none=True)
+
+
 class QuestionAnswerRequest(BaseModel):
     text: str
     questions: list[str]
@@ -66,6 +139,25 @@ class MaskFillerResponse(ApiResponse):
     data: list[MaskFillerOutput]
 
 
+class EmbeddingRequest(BaseModel):
+    sentences: list[str] = Field(..., min_length=1)
+    encoding: Encoding = Encoding.json
+    dtype: DType = DType.float32
+    dimensions: int | None = Field(None, ge=1)
+    normalize: bool = False
+
+
+class EmbeddingOutput(BaseModel):
+    dtype: DType
+    shape: list[int]
+    scale: float | None = None
+    embeddings: list[list[float]] | str
+
+
+class EmbeddingResponse(ApiResponse):
+    data: EmbeddingOutput
+
+
 class SentencesSimilarityResponse(ApiResponse):
 
     class SimilarityScore(BaseModel):
@@ -98,16 +190,23 @@ async def desc():
     return ApiResponse(data={"app": "text"})
 
 
-@app.post("/classifier", response_model=ApiResponseList)
+@app.post("/classifier",
+          response_model=ApiResponseList,
+          dependencies=[Depends(admit("text/classifier"))])
 @cache(expire=30)
-async def classifier(payload: list[TextRequest]):
+async def classifier(payload: list[TextRequest],
+                     policy: LengthPolicy = DEFAULT_POLICY):
     """
     Text classification.
 
     Classify a list of texts using a text classification model.
+    Duplicate texts (after Unicode and whitespace normalization) go through the model
+    once, and results are cached per text.
 
     Parameters:
     - **payload**: List of TextRequest objects containing the input texts.
+    - **policy**: What to do with texts above the endpoint token limit: `truncate`,
+      `reject` (413 response) or `sliding-window` (window scores are averaged).
 
     Returns:
     - **ApiResponseList**: A list of responses containing classification results for each input text.
@@ -136,20 +235,27 @@ async def classifier(payload: list[TextRequest]):
     ```
     """
     text = [p.text for p in payload]
-    result = await processors.classify(text)
-    return ApiResponse(data=result)
+    result = await run_classifier(text, policy)
+    return respond(ApiResponseList, result)
 
 
-@app.post("/sentiment-analyzer", response_model=ApiResponseList)
+@app.post("/sentiment-analyzer",
+          response_model=ApiResponseList,
+          dependencies=[Depends(admit("text/sentiment-analyzer"))])
 @cache(expire=30)
-async def sentiment_analyzer(payload: list[TextRequest]):
+async def sentiment_analyzer(payload: list[TextRequest],
+                             policy: LengthPolicy = DEFAULT_POLICY):
     """
     Sentiment analysis.
 
     Analyze sentiment for a list of texts.
+    Duplicate texts (after Unicode and whitespace normalization) go through the model
+    once, and results are cached per text.
 
     Parameters:
     - **payload**: List of TextRequest objects containing the input texts.
+    - **policy**: What to do with texts above the endpoint token limit: `truncate`,
+      `reject` (413 response) or `sliding-window` (window scores are averaged).
 
     Returns:
     - **ApiResponseList**: A list of responses containing sentiment analysis results for each input text.
@@ -185,20 +291,27 @@ async def sentiment_analyzer(payload: list[TextRequest]):
     ```
     """
     text = [p.text for p in payload]
-    result = await processors.analyze_sentiment(text)
-    return ApiResponse(data=result)
+    result = await run_sentiment_analyzer(text, policy)
+    return respond(ApiResponseList, result)
 
 
-@app.post("/summarizer", response_model=ApiResponse)
+@app.post("/summarizer",
+          response_model=ApiResponse,
+          dependencies=[Depends(admit("text/summarizer"))])
 @cache(expire=30)
-async def summarizer(payload: TextRequest):
+async def summarizer(payload: SummarizeRequest,
+                     policy: LengthPolicy = DEFAULT_POLICY):
     """
     Text summarization.
 
     Summarize the input text.
 
     Parameters:
-    - **payload**: TextRequest object containing the input text.
+    - **payload**: SummarizeRequest object containing the input text and optional
+      generation parameters (`max_length`, `min_length`, `num_beams`, `early_stopping`).
+      Lower `max_length` and `num_beams` trade summary quality for latency.
+    - **policy**: What to do with texts above the endpoint token limit: `truncate`,
+      `reject` (413 response) or `sliding-window` (window summaries are joined).
 
     Returns:
     - **ApiResponse**: A response containing the summarized text.
@@ -220,12 +333,91 @@ async def summarizer(payload: TextRequest):
     }
     ```
     """
-    text = payload.text
-    result = await processors.summarize(text)
-    return ApiResponse(data=result[0])
+    result = await processors.summarize(
+        payload.text,
+        max_tokens=MAX_TOKENS.get("summarizer"),
+        policy=policy,
+        **payload.generate_kwargs())
+    return respond(ApiResponse, result[0])
+
+
+@app.post("/summarizer/stream",
+          dependencies=[Depends(admit("text/summarizer"))])
+async def summarizer_stream(payload: SummarizeRequest,
+                            policy: LengthPolicy = DEFAULT_POLICY):
+    """
+    Streaming text summarization.
+
+    Summarize the input text and stream the summary as server-sent events while
+    tokens are decoded. Streaming uses greedy decoding, so `num_beams` must be 1
+    or left empty.
+
+    Parameters:
+    - **payload**: SummarizeRequest object containing the input text and optional
+      generation parameters.
+    - **policy**: What to do with texts above the endpoint token limit: `truncate` or
+      `reject` (413 response). `sliding-window` falls back to `truncate`.
+
+    Returns:
+    - **text/event-stream**: One `token` event per decoded fragment, followed by a
+      `done` event holding the full summary, or by an `error` event when generation
+      fails or stalls.
 
+    Example Request:
+    ```
+    POST /summarizer/stream
+    {
+        "text": "This is a long piece of text...",
+        "max_length": 60
+    }
+    ```
+
+    Example Response:
+    ```
+    event: token
+    data: {"token": " This"}
 
-@app.post("/question-answering", response_model=QuestionAnswerResponse)
+    event: token
+    data: {"token": " is a"}
+
+    event: done
+    data: {"summary_text": " This is a summarized version..."}
+    ```
+    """
+    params = payload.generate_kwargs()
+    if params.pop("num_beams", 1) != 1:
+        raise HTTPException(status_code=400,
+                            detail="streaming requires num_beams=1")
+
+    tokens = processors.summarize_stream(
+        payload.text,
+        max_tokens=MAX_TOKENS.get("summarizer"),
+        policy=policy,
+        **params)
+
+    def events():
+        summary = []
+        try:
+            # closing `tokens` stops generation when the client goes away
+            with closing(tokens):
+                for token in tokens:
+                    summary.append(token)
+                    event = dumps({"token": token})
+                    yield b"event: token\ndata: " + event + b"\n\n"
+        except (Exception, ) as exc:
+            logger.error(exc)
+            error = dumps({"error": "summary generation failed"})
+            yield b"event: error\ndata: " + error + b"\n\n"
+            return
+        done = dumps({"summary_text": "".join(summary)})
+        yield b"event: done\ndata: " + done + b"\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/question-answering",
+          response_model=QuestionAnswerResponse,
+          dependencies=[Depends(admit("text/question-answering"))])
 @cache(expire=30)
 async def question_answering(payload: QuestionAnswerRequest):
     """
@@ -279,10 +471,12 @@ async def question_answering(payload: QuestionAnswerRequest):
     for question in payload.questions:
         answer = await processors.answer_question(payload.text, question)
         answers.append({"question": question, "answer": answer})
-    return QuestionAnswerResponse(data=answers)
+    return respond(QuestionAnswerResponse, answers)
 
 
-@app.post("/labelizer", response_model=LabelResponse)
+@app.post("/labelizer",
+          response_model=LabelResponse,
+          dependencies=[Depends(admit("text/labelizer"))])
 @cache(expire=30)
 async def labelizer(payload: LabelRequest, multi_label=True):
     """
@@ -319,10 +513,12 @@ async def labelizer(payload: LabelRequest, multi_label=True):
     result = await processors.zero_shot_classify(payload.text,
                                                  payload.labels,
                                                  multi_label=multi_label)
-    return LabelResponse(data=result)
+    return respond(LabelResponse, result)
 
 
-@app.post("/mask-filler", response_model=MaskFillerResponse)
+@app.post("/mask-filler",
+          response_model=MaskFillerResponse,
+          dependencies=[Depends(admit("text/mask-filler"))])
 @cache(expire=30)
 async def mask_filler(payload: TextRequest):
     """
@@ -384,10 +580,12 @@ async def mask_filler(payload: TextRequest):
     ```
     """
     result = await processors.mask_filler(payload.text)
-    return MaskFillerResponse(data=result)
+    return respond(MaskFillerResponse, result)
 
 
-@app.post("/similarities-detector", response_model=SentencesSimilarityResponse)
+@app.post("/similarities-detector",
+          response_model=SentencesSimilarityResponse,
+          dependencies=[Depends(admit("text/similarities-detector"))])
 @cache(expire=30)
 async def similarities_detector(sentences: list[str]):
     """
@@ -425,4 +623,148 @@ async def similarities_detector(sentences: list[str]):
     """
 
     result = await processors.similarities_check(sentences)
-    return SentencesSimilarityResponse(data=result)
+    return respond(SentencesSimilarityResponse, result)
+
+
+@app.post("/embeddings",
+          response_model=EmbeddingResponse,
+          dependencies=[Depends(admit("text/embeddings"))])
+async def embeddings(payload: EmbeddingRequest):
+    """
+    Sentence embeddings.
+
+    Encode sentences into vectors with the sentence similarity model.
+
+    Parameters:
+    - **payload**: EmbeddingRequest object holding:
+      - **sentences**: The sentences to encode.
+      - **encoding**: `json` (lists of numbers), `base64` (row-major little-endian
+        buffer) or `npy` (a NumPy `.npy` file as the response body).
+      - **dtype**: `float32`, `float16` or `int8`. int8 values are quantized with a
+        single `scale` per batch: `value / scale` approximates the float vector. With
+        `npy`, the scale comes in the `X-Embedding-Scale` header.
+      - **dimensions**: Keep only the first components of each vector.
+      - **normalize**: L2-normalize vectors (after truncation).
+
+    Returns:
+    - **EmbeddingResponse**: The vectors and their shape.
+
+    Example Request:
+    ```
+    POST /embeddings
+    {
+        "sentences": ["The quick brown fox", "A fast fox"],
+        "encoding": "base64",
+        "dtype": "float16",
+        "dimensions": 256,
+        "normalize": true
+    }
+    ```
+
+    Example Response:
+    ```
+    {
+        "error": null,
+        "data": {
+            "dtype": "float16",
+            "shape": [2, 256],
+            "scale": null,
+            "embeddings": "AAC8PQ..."
+        }
+    }
+    ```
+    """
+    vectors = await processors.embed(payload.sentences,
+                                     dimensions=payload.dimensions,
+                                     normalize=payload.normalize,
+                                     batch_size=settings.TEXT_BATCH_SIZE)
+    values, scale = quantize(vectors, payload.dtype)
+    if payload.encoding == Encoding.npy:
+        headers = {"X-Embedding-Scale": str(scale)} if scale else None
+        return Response(content=to_npy(values),
+                        media_type="application/octet-stream",
+                        headers=headers)
+    data = {
+        "dtype": payload.dtype,
+        "shape": list(values.shape),
+        "scale": scale,
+        "embeddings":
+        to_base64(values) if payload.encoding == Encoding.base64 else values,
+    }
+    # vectors are serialized by orjson straight from numpy, never validated
+    return ApiJSONResponse({"error": None, "data": data})
+
+
+@app.websocket("/ws")
+async def stream_inference(websocket: WebSocket):
+    """
+    Streaming inference channel.
+
+    Clients pipeline many requests over one connection. Each message names a
+    task (`classifier` or `sentiment-analyzer`) and carries an `id` echoed in
+    its response. Responses are sent as soon as they are ready, so they may
+    come back out of order. Texts from all connections are micro-batched and go
+    through the same processing as the HTTP routes. Each batch is admitted
+    like a request to the matching HTTP route, and the texts of a rejected
+    batch get an error instead of a result.
+
+    Example messages:
+    ```
+    > {"id": 1, "task": "classifier", "text": "I love it"}
+    > {"id": 2, "task": "sentiment-analyzer", "text": "Thanks a lot!"}
+    < {"id": 2, "data": {"label": "gratitude", "score": 0.96}}
+    < {"id": 1, "data": {"label": "POSITIVE", "score": 0.99}}
+    ```
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    inflight = asyncio.Semaphore(settings.TEXT_WS_MAX_INFLIGHT)
+    tasks = set()
+
+    async def send(message):
+        async with send_lock:
+            await websocket.send_text(dumps(message).decode())
+
+    async def handle(message):
+        try:
+            try:
+                result = await batchers[message["task"]].submit(
+                    message["text"])
+                reply = {"id": message["id"], "data": result}
+            except (TextTooLongError, ) as exc:
+                error = f"text above {exc.max_tokens} tokens"
+                reply = {"id": message["id"], "error": error}
+            except (HTTPException, ) as exc:
+                # rejected by admission control
+                reply = {"id": message["id"], "error": exc.detail}
+            except (Exception, ) as exc:
+                logger.error(exc)
+                reply = {"id": message["id"], "error": "inference failed"}
+            await send(reply)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            inflight.release()
+
+    try:
+        while True:
+            raw = await websocket.receive()
+            if raw["type"] == "websocket.disconnect":
+                break
+            try:
+                message = orjson.loads(raw.get("bytes") or raw.get("text"))
+                if ("id" not in message or message["task"] not in batchers
+                        or not isinstance(message["text"], str)
+                        or not message["text"]):
+                    raise ValueError
+            except (ValueError, KeyError, TypeError):
+                await send({"id": None, "error": "invalid message"})
+                continue
+            await inflight.acquire()
+            task = asyncio.create_task(handle(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except (WebSocketDisconnect, ):
+        pass
+    for task in tasks:
+        task.cancel()
@@ -0,0 +1,66 @@
+import asyncio
+
+from app.logger import logger
+from app.text.length import TextTooLongError
+
+
+class MicroBatcher:
+    """
+    Coalesce texts submitted one by one into batches for a list processor.
+
+    A batch is flushed once `max_batch` texts are pending or `max_wait`
+    seconds after its first text, whichever comes first. Inference blocks the
+    event loop, so texts received meanwhile naturally pile up into the next
+    batch.
+    """
+
+    def __init__(self, func, max_batch: int = 16, max_wait: float = 0.005):
+        self.func = func
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = []
+        self._timer = None
+
+    async def submit(self, text: str):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((text, future))
+        if len(self.pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch):
+        while batch:
+            try:
+                results = await self.func([text for text, _ in batch])
+            except (TextTooLongError, ) as exc:
+                # fail the offending texts only and retry the others
+                failed = set(exc.indices)
+                for i in failed:
+                    if not batch[i][1].done():
+                        batch[i][1].set_exception(
+                            TextTooLongError([0], exc.max_tokens))
+                batch = [
+                    item for i, item in enumerate(batch) if i not in failed
+                ]
+                continue
+            except (Exception, ) as exc:
+                logger.error(exc)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            return
@@ -0,0 +1,76 @@
+import hashlib
+import unicodedata
+
+import orjson
+from fastapi_redis_cache import FastApiRedisCache
+
+from app import metrics
+from app.logger import logger
+from app.settings import settings
+from app.text.length import LengthPolicy, TextTooLongError
+
+
+def normalize(text: str) -> str:
+    """NFKC-normalize and collapse whitespace. Case is kept, as cased models
+    tell `Great` from `GREAT`."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(task: str, text: str) -> str:
+    digest = hashlib.sha1(text.encode()).hexdigest()
+    return f"{settings.NAME}-cache:text:{task}:{digest}"
+
+
+def cache_get(task: str, texts: list[str]) -> dict:
+    redis_cache = FastApiRedisCache()
+    if not texts or not redis_cache.connected:
+        return {}
+    try:
+        values = redis_cache.redis.mget([cache_key(task, t) for t in texts])
+    except (Exception, ) as exc:
+        logger.error(exc)
+        return {}
+    return {t: orjson.loads(v) for t, v in zip(texts, values) if v is not None}
+
+
+def cache_set(task: str, results: dict):
+    redis_cache = FastApiRedisCache()
+    if not results or not redis_cache.connected:
+        return
+    try:
+        pipe = redis_cache.redis.pipeline()
+        for text, result in results.items():
+            pipe.setex(cache_key(task, text), settings.TEXT_CACHE_EXPIRE,
+                       orjson.dumps(result))
+        pipe.execute()
+    except (Exception, ) as exc:
+        logger.error(exc)
+
+
+async def run_unique(task: str, func, texts: list[str], policy: LengthPolicy,
+                     **kwargs) -> list:
+    """
+    Run a list processor on unique, unseen texts only.
+
+    Texts are normalized and deduplicated, cached results are looked up per
+    text, and only the remaining texts reach `func`. Results are fanned back
+    out to the original positions.
+    """
+    keys = [normalize(text) for text in texts]
+    unique = list(dict.fromkeys(keys))
+    scope = f"{task}:{policy.value}"
+    results = cache_get(scope, unique)
+    missing = [key for key in unique if key not in results]
+    if missing:
+        try:
+            outputs = await func(missing, policy=policy, **kwargs)
+        except (TextTooLongError, ) as exc:
+            failed = {missing[i] for i in exc.indices}
+            raise TextTooLongError(
+                [i for i, key in enumerate(keys) if key in failed],
+                exc.max_tokens)
+        fresh = dict(zip(missing, outputs))
+        cache_set(scope, fresh)
+        results.update(fresh)
+    metrics.record_dedup(task, len(texts), len(unique), len(missing))
+    return [results[key] for key in keys]
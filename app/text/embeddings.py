@@ -0,0 +1,44 @@
+import base64
+from enum import Enum
+from io import BytesIO
+
+import numpy as np
+
+
+class Encoding(str, Enum):
+    json = "json"
+    base64 = "base64"
+    npy = "npy"
+
+
+class DType(str, Enum):
+    float32 = "float32"
+    float16 = "float16"
+    int8 = "int8"
+
+
+def quantize(embeddings: np.ndarray, dtype: DType) -> tuple:
+    """
+    Cast float32 embeddings to `dtype`.
+
+    int8 uses one symmetric scale for the whole batch: `values / scale`
+    approximates the float vectors. The scale is None for float types.
+    """
+    if dtype != DType.int8:
+        return embeddings.astype(dtype.value), None
+    peak = float(np.abs(embeddings).max()) or 1.0
+    scale = 127 / peak
+    values = np.clip(np.rint(embeddings * scale), -127, 127).astype(np.int8)
+    return values, scale
+
+
+def to_base64(values: np.ndarray) -> str:
+    """Pack a C-ordered little-endian array into base64."""
+    return base64.b64encode(values.astype(values.dtype.newbyteorder("<"),
+                                          copy=False).tobytes()).decode()
+
+
+def to_npy(values: np.ndarray) -> bytes:
+    buf = BytesIO()
+    np.save(buf, values, allow_pickle=False)
+    return buf.getvalue()
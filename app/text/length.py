@@ -0,0 +1,135 @@
+from enum import Enum
+
+
+class LengthPolicy(str, Enum):
+    truncate = "truncate"
+    reject = "reject"
+    sliding_window = "sliding-window"
+
+
+class TextTooLongError(ValueError):
+
+    def __init__(self, indices: list[int], max_tokens: int):
+        self.indices = indices
+        self.max_tokens = max_tokens
+        super().__init__(f"text at position(s) {indices} above "
+                         f"{max_tokens} tokens")
+
+
+def count_tokens(tokenizer, texts: list[str]) -> list[int]:
+    """Count tokens of each text, special tokens included."""
+    encoded = tokenizer(texts,
+                        add_special_tokens=True,
+                        return_attention_mask=False,
+                        return_token_type_ids=False,
+                        verbose=False)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def check_lengths(lengths: list[int], max_tokens: int):
+    too_long = [i for i, length in enumerate(lengths) if length > max_tokens]
+    if too_long:
+        raise TextTooLongError(too_long, max_tokens)
+
+
+def split_windows(tokenizer,
+                  text: str,
+                  max_tokens: int,
+                  stride: int = 64) -> list[str]:
+    """
+    Split a text into overlapping windows of at most `max_tokens` tokens.
+
+    Windows are cut on token offsets so that each one is a substring of the
+    original text, and consecutive windows share `stride` tokens.
+    """
+    offsets = tokenizer(text,
+                        add_special_tokens=False,
+                        return_offsets_mapping=True,
+                        verbose=False)["offset_mapping"]
+    size = max(max_tokens - tokenizer.num_special_tokens_to_add(), 1)
+    step = max(size - stride, 1)
+    windows = []
+    for start in range(0, len(offsets), step):
+        window = offsets[start:start + size]
+        windows.append(text[window[0][0]:window[-1][1]])
+        if start + size >= len(offsets):
+            break
+    return windows or [text]
+
+
+def token_limit(tokenizer, max_tokens: int | None) -> int:
+    """`max_tokens` capped by the model limit, or the model limit when unset.
+    Inputs past the limit would overflow the position embeddings."""
+    if not max_tokens:
+        return tokenizer.model_max_length
+    return min(max_tokens, tokenizer.model_max_length)
+
+
+def truncate_text(tokenizer, text: str, max_tokens: int) -> str:
+    return split_windows(tokenizer, text, max_tokens)[0]
+
+
+def run_sorted(pipe, texts: list[str], lengths: list[int], **kwargs) -> list:
+    """
+    Run a pipeline on texts sorted by token length.
+
+    The pipeline groups consecutive inputs into batches, so sorting keeps
+    texts of similar length together and cuts padding. Outputs are returned
+    in the original order.
+    """
+    order = sorted(range(len(texts)), key=lengths.__getitem__)
+    outputs = pipe([texts[i] for i in order], **kwargs)
+    result = [None] * len(texts)
+    for i, output in zip(order, outputs):
+        result[i] = output
+    return result
+
+
+def mean_scores(outputs: list[list[dict]]) -> dict:
+    """Average the `top_k=None` classification outputs of several windows
+    and keep the best label, as the pipeline does for a single text."""
+    scores = {}
+    for output in outputs:
+        for item in output:
+            label = item["label"]
+            scores[label] = scores.get(label, 0) + item["score"]
+    label = max(scores, key=scores.get)
+    return {"label": label, "score": scores[label] / len(outputs)}
+
+
+def classify_texts(pipe,
+                   texts: list[str],
+                   max_tokens: int | None,
+                   policy: LengthPolicy,
+                   batch_size: int = 1) -> list[dict]:
+    """Classify texts with a text-classification pipeline, enforcing
+    `max_tokens` (capped by the model limit) according to `policy`."""
+    max_tokens = token_limit(pipe.tokenizer, max_tokens)
+    lengths = count_tokens(pipe.tokenizer, texts)
+    if policy == LengthPolicy.reject:
+        check_lengths(lengths, max_tokens)
+    if policy != LengthPolicy.sliding_window:
+        return run_sorted(pipe,
+                          texts, [min(n, max_tokens) for n in lengths],
+                          batch_size=batch_size,
+                          truncation=True,
+                          max_length=max_tokens)
+
+    pieces, owners = [], []
+    for i, (text, length) in enumerate(zip(texts, lengths)):
+        windows = [text]
+        if length > max_tokens:
+            windows = split_windows(pipe.tokenizer, text, max_tokens)
+        pieces.extend(windows)
+        owners.extend([i] * len(windows))
+    outputs = run_sorted(pipe,
+                         pieces,
+                         count_tokens(pipe.tokenizer, pieces),
+                         batch_size=batch_size,
+                         truncation=True,
+                         max_length=max_tokens,
+                         top_k=None)
+    grouped = [[] for _ in texts]
+    for owner, output in zip(owners, outputs):
+        grouped[owner].append(output)
+    return [mean_scores(group) for group in grouped]
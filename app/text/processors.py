@@ -1,47 +1,158 @@
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
-import torch
-
-
-async def classify(text):
-    pipe = pipeline("text-classification",
-                    model="distilbert-base-uncased-finetuned-sst-2-english")
-    result = pipe(text)
+import queue
+from functools import cache
+from threading import Event, Thread
+
+from app import profiling, startup
+from app.startup import get_pipeline
+from app.settings import settings
+from app.text.length import (LengthPolicy, check_lengths, classify_texts,
+                             count_tokens, split_windows, token_limit,
+                             truncate_text)
+
+# transformers, sentence_transformers and torch are imported where they are
+# used, so that loading this module (and mounting the text app) stays cheap.
+
+
+async def classify(text,
+                   max_tokens=None,
+                   policy=LengthPolicy.truncate,
+                   batch_size=1):
+    pipe = get_pipeline("text-classification",
+                        "distilbert-base-uncased-finetuned-sst-2-english")
+    result = classify_texts(pipe, text, max_tokens, policy, batch_size)
     return result
 
 
-async def analyze_sentiment(text):
-    pipe = pipeline("text-classification",
-                    model="SamLowe/roberta-base-go_emotions")
-    result = pipe(text)
+async def analyze_sentiment(text,
+                            max_tokens=None,
+                            policy=LengthPolicy.truncate,
+                            batch_size=1):
+    pipe = get_pipeline("text-classification",
+                        "SamLowe/roberta-base-go_emotions")
+    result = classify_texts(pipe, text, max_tokens, policy, batch_size)
     return result
 
 
-async def summarize(text):
-    pipe = pipeline("summarization", model="facebook/bart-large-cnn")
-    return pipe(text)
+async def summarize(text,
+                    max_tokens=None,
+                    policy=LengthPolicy.truncate,
+                    **generate_kwargs):
+    pipe = get_pipeline("summarization", "facebook/bart-large-cnn")
+    max_tokens = token_limit(pipe.tokenizer, max_tokens)
+    length = count_tokens(pipe.tokenizer, [text])[0]
+    if length <= max_tokens:
+        return pipe(text, **generate_kwargs)
+    if policy == LengthPolicy.reject:
+        check_lengths([length], max_tokens)
+    if policy == LengthPolicy.truncate:
+        text = truncate_text(pipe.tokenizer, text, max_tokens)
+        return pipe(text, **generate_kwargs)
+    windows = split_windows(pipe.tokenizer, text, max_tokens)
+    summaries = pipe(windows, **generate_kwargs)
+    summary = " ".join(s["summary_text"].strip() for s in summaries)
+    return [{"summary_text": summary}]
+
+
+def summarize_stream(text,
+                     max_tokens=None,
+                     policy=LengthPolicy.truncate,
+                     **generate_kwargs):
+    """Return an iterator of summary text fragments, yielded as soon as they
+    are decoded.
+
+    Generation runs in a background thread and feeds a streamer that is
+    consumed by the iterator. Streaming only works with greedy decoding, so
+    `num_beams` is forced to 1. Texts above `max_tokens` (capped by the model
+    limit) are rejected with the `reject` policy and truncated otherwise.
+
+    An error raised by generation is re-raised by the iterator, which also
+    raises `TimeoutError` when no fragment comes for `LK_TEXT_STREAM_TIMEOUT`
+    seconds. Generation stops at the next token once the iterator is closed
+    (the client went away) or timed out.
+    """
+    import torch
+    from transformers import (StoppingCriteria, StoppingCriteriaList,
+                              TextIteratorStreamer)
+    pipe = get_pipeline("summarization", "facebook/bart-large-cnn")
+    max_tokens = token_limit(pipe.tokenizer, max_tokens)
+    if policy == LengthPolicy.reject:
+        check_lengths(count_tokens(pipe.tokenizer, [text]), max_tokens)
+    streamer = TextIteratorStreamer(pipe.tokenizer,
+                                    skip_prompt=True,
+                                    skip_special_tokens=True,
+                                    timeout=settings.TEXT_STREAM_TIMEOUT)
+    inputs = pipe.tokenizer(text,
+                            return_tensors="pt",
+                            truncation=True,
+                            max_length=max_tokens)
+    stop = Event()
+
+    class Stopped(StoppingCriteria):
+
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0], ),
+                              stop.is_set(),
+                              dtype=torch.bool,
+                              device=input_ids.device)
+
+    stopping = StoppingCriteriaList([Stopped()])
+    generate_kwargs.update(inputs,
+                           streamer=streamer,
+                           num_beams=1,
+                           stopping_criteria=stopping)
+    errors = []
+
+    def generate():
+        try:
+            with profiling.record("facebook/bart-large-cnn"):
+                pipe.model.generate(**generate_kwargs)
+        except (Exception, ) as exc:
+            errors.append(exc)
+            streamer.end()
+
+    thread = Thread(target=generate, daemon=True)
+
+    def fragments():
+        # generation starts with the iteration, so that a response closed
+        # before its first chunk leaves no thread behind
+        thread.start()
+        try:
+            for fragment in streamer:
+                if fragment:
+                    yield fragment
+        except (queue.Empty, ):
+            raise TimeoutError("summary generation timed out")
+        finally:
+            # also reached on GeneratorExit, when the response is closed
+            stop.set()
+        thread.join()
+        if errors:
+            raise errors[0]
+
+    return fragments()
 
 
 async def answer_question(text, question):
-    pipe = pipeline("question-answering", model="deepset/roberta-base-squad2")
+    pipe = get_pipeline("question-answering", "deepset/roberta-base-squad2")
     result = pipe({"question": question, "context": text})
     return result
 
 
 async def mask_filler(text):
-    pipe = pipeline("fill-mask", model="bert-base-uncased")
+    pipe = get_pipeline("fill-mask", "bert-base-uncased")
     result = pipe(text)
     return result
 
 
 async def zero_shot_classify(text, labels, multi_label=True):
-    classifier = pipeline("zero-shot-classification",
-                          model="MoritzLaurer/DeBERTa-v3-base-mnli-fever-anli")
+    classifier = get_pipeline("zero-shot-classification",
+                              "MoritzLaurer/DeBERTa-v3-base-mnli-fever-anli")
     result = classifier(text, labels, multi_label=multi_label)
     return result
 
 
 def mean_pooling(model_output, attention_mask):
+    import torch
     token_embeddings = model_output[
         0]  #First element of model_output contains all token embeddings
     input_mask_expanded = attention_mask.unsqueeze(-1).expand(
@@ -50,8 +161,38 @@ def mean_pooling(model_output, attention_mask):
         input_mask_expanded.sum(1), min=1e-9)
 
 
+@cache
+def get_sentence_model(model):
+    from sentence_transformers import SentenceTransformer
+    with startup.timed("models", model):
+        return profiling.Traced(SentenceTransformer(model),
+                                model,
+                                methods=("encode", ))
+
+
+async def embed(sentences, dimensions=None, normalize=False, batch_size=32):
+    """
+    Encode sentences into a float32 `(len(sentences), dimensions)` array.
+
+    Vectors are truncated to their first `dimensions` components, then L2
+    normalized if asked, so that truncated vectors can still be compared by
+    dot product.
+    """
+    import numpy as np
+    model = get_sentence_model('sentence-transformers/all-mpnet-base-v2')
+    embeddings = model.encode(sentences,
+                              batch_size=batch_size,
+                              convert_to_numpy=True)
+    embeddings = embeddings[:, :dimensions].astype(np.float32)
+    if normalize:
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.maximum(norms, 1e-12)
+    return embeddings
+
+
 async def similarities_check(sentences):
-    model = SentenceTransformer('sentence-transformers/all-mpnet-base-v2')
+    import torch
+    model = get_sentence_model('sentence-transformers/all-mpnet-base-v2')
     embeddings = model.encode(sentences)
     cos = torch.nn.CosineSimilarity(dim=0)
     result = []
@@ -0,0 +1,115 @@
+from itertools import islice
+
+from fastapi import Depends, FastAPI, Query, UploadFile
+from fastapi.responses import StreamingResponse
+
+from app.admission import admit
+from app.image import processor as image_processor
+from app.media import ndjson, open_upload
+from app.response import ApiJSONResponse, ApiResponse
+from app.settings import settings
+from app.video.stream import Sampling, dedup_frames, sample_frames
+
+app = FastAPI(title="Video processing app",
+              default_response_class=ApiJSONResponse)
+
+
+def track(payload: UploadFile, task: tuple, sampling: Sampling, fps: float,
+          scene_threshold: float, dedup: bool) -> StreamingResponse:
+    """
+    Run the `(task, model)` image pipeline over sampled frames and stream a
+    per-timestamp track.
+
+    Frames are decoded, sampled and deduplicated lazily and sent to the model
+    `VIDEO_BATCH_SIZE` at a time, so only one batch of frames is in memory.
+    """
+    video = open_upload(payload, "video", settings.VIDEO_CTYPES,
+                        settings.VIDEO_MAXSIZE)
+
+    def lines():
+        pipe = image_processor.get_pipeline(*task)
+        frames = sample_frames(video, sampling, fps, scene_threshold)
+        if dedup:
+            frames = dedup_frames(frames, settings.VIDEO_DEDUP_DISTANCE)
+        while batch := list(islice(frames, settings.VIDEO_BATCH_SIZE)):
+            timestamps, images = zip(*batch)
+            results = pipe(list(images), batch_size=len(images))
+            for timestamp, result in zip(timestamps, results):
+                yield {"timestamp": round(timestamp, 3), "data": result}
+
+    return StreamingResponse(ndjson(video, "video", lines()),
+                             media_type="application/x-ndjson")
+
+
+@app.get("/", response_model=ApiResponse)
+async def desc():
+    return ApiResponse(data={"app": "video"})
+
+
+@app.post("/classify", dependencies=[Depends(admit("video/classify"))])
+def classify(payload: UploadFile,
+             sampling: Sampling = Sampling.fps,
+             fps: float = Query(1.0, gt=0),
+             scene_threshold: float = 0.3,
+             dedup: bool = True):
+    """
+    Video classification.
+
+    Classify sampled frames of an uploaded video with the image classification model.
+
+    Parameters:
+    - **payload**: The uploaded video file.
+    - **sampling**: `fps` (fixed rate), `keyframes` or `scene` (scene changes).
+    - **fps**: Frames per second to sample with `fps` sampling.
+    - **scene_threshold**: Mean frame difference (0 to 1) starting a new scene.
+    - **dedup**: Skip frames whose perceptual hash is within `LK_VIDEO_DEDUP_DISTANCE`
+      bits of the last kept frame.
+
+    Returns:
+    - **application/x-ndjson**: One line per sampled frame. Files that can't be
+      decoded or hold no video track are rejected with 400, and data corrupted past
+      the start of the file ends the stream with an `error` line.
+
+    Example Response:
+    ```
+    {"timestamp": 0.0, "data": [{"score": 0.85, "label": "cat"}, {"score": 0.1, "label": "dog"}]}
+    {"timestamp": 1.0, "data": [{"score": 0.79, "label": "cat"}, {"score": 0.12, "label": "dog"}]}
+    ```
+    """
+    return track(payload, image_processor.CLASSIFIER, sampling, fps,
+                 scene_threshold, dedup)
+
+
+@app.post("/detect-object",
+          dependencies=[Depends(admit("video/detect-object"))])
+def detect_object(payload: UploadFile,
+                  sampling: Sampling = Sampling.fps,
+                  fps: float = Query(1.0, gt=0),
+                  scene_threshold: float = 0.3,
+                  dedup: bool = True):
+    """
+    Video object detection.
+
+    Detect objects in sampled frames of an uploaded video.
+
+    Parameters:
+    - **payload**: The uploaded video file.
+    - **sampling**: `fps` (fixed rate), `keyframes` or `scene` (scene changes).
+    - **fps**: Frames per second to sample with `fps` sampling.
+    - **scene_threshold**: Mean frame difference (0 to 1) starting a new scene.
+    - **dedup**: Skip frames whose perceptual hash is within `LK_VIDEO_DEDUP_DISTANCE`
+      bits of the last kept frame.
+
+    Returns:
+    - **application/x-ndjson**: One line per sampled frame. Files that can't be
+      decoded or hold no video track are rejected with 400, and data corrupted past
+      the start of the file ends the stream with an `error` line.
+
+    Example Response:
+    ```
+    {"timestamp": 0.0, "data": [{"score": 0.98, "label": "cat", "box": {"xmin": 12, "ymin": 40, "xmax": 320, "ymax": 410}}]}
+    {"timestamp": 2.0, "data": [{"score": 0.97, "label": "cat", "box": {"xmin": 30, "ymin": 42, "xmax": 335, "ymax": 408}}]}
+    ```
+    """
+    return track(payload, image_processor.DETECTOR, sampling, fps,
+                 scene_threshold, dedup)
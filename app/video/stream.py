@@ -0,0 +1,71 @@
+from enum import Enum
+from typing import BinaryIO, Iterator
+
+import av
+import numpy as np
+from PIL import Image
+
+
+class Sampling(str, Enum):
+    fps = "fps"
+    keyframes = "keyframes"
+    scene = "scene"
+
+
+def sample_frames(file: BinaryIO,
+                  sampling: Sampling = Sampling.fps,
+                  fps: float = 1.0,
+                  scene_threshold: float = 0.3) -> Iterator[tuple]:
+    """
+    Decode a video in a stream and yield `(timestamp, image)` samples.
+
+    - `fps`: one frame every `1 / fps` seconds.
+    - `keyframes`: keyframes only, the other frames are not even decoded.
+    - `scene`: frames whose mean difference with the previous frame, on a
+      64x36 grayscale thumbnail scaled to [0, 1], is above `scene_threshold`.
+
+    Only sampled frames are converted to PIL images.
+    """
+    with av.open(file) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        if sampling == Sampling.keyframes:
+            stream.codec_context.skip_frame = "NONKEY"
+        next_time, previous = 0.0, None
+        for frame in container.decode(stream):
+            if frame.time is None:
+                continue
+            if sampling == Sampling.fps:
+                if frame.time < next_time:
+                    continue
+                next_time = frame.time + 1 / fps
+            elif sampling == Sampling.scene:
+                thumb = frame.reformat(width=64, height=36,
+                                       format="gray").to_ndarray() / 255
+                changed = previous is None or np.mean(
+                    np.abs(thumb - previous)) > scene_threshold
+                previous = thumb
+                if not changed:
+                    continue
+            yield frame.time, frame.to_image()
+
+
+def dhash(img: Image.Image, size: int = 8) -> int:
+    """Difference hash: one bit per horizontal gradient of a thumbnail."""
+    small = img.convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def dedup_frames(frames: Iterator[tuple],
+                 max_distance: int) -> Iterator[tuple]:
+    """Drop frames whose hash is within `max_distance` bits of the last kept
+    frame."""
+    last = None
+    for timestamp, img in frames:
+        digest = dhash(img)
+        if last is not None and bin(digest ^ last).count("1") <= max_distance:
+            continue
+        last = digest
+        yield timestamp, img
@@ -0,0 +1,77 @@
+"""Fixed inputs of the regression harness. Images are drawn, not downloaded,
+so the corpus is deterministic and needs no network."""
+import random
+
+from PIL import Image, ImageDraw
+
+TEXTS = [
+    "I absolutely loved this movie, the cast was brilliant.",
+    "The service was slow and the food arrived cold.",
+    "Thanks a lot for your help yesterday!",
+    "I'm not sure how I feel about the new update.",
+    "This is the worst purchase I have ever made.",
+    "What a wonderful surprise, I can't stop smiling.",
+    "The package was delivered on time.",
+    "Why does this keep crashing every time I open it?",
+    "Great value for the price, would recommend.",
+    "I am so angry right now, nothing works.",
+    "The meeting has been moved to Thursday at 3pm.",
+    "Honestly, it was fine. Nothing special.",
+    ("The city council approved the new budget on Tuesday after a long "
+     "debate. The plan increases spending on public transport and schools, "
+     "while cutting administrative costs. Opponents argued that the tax "
+     "increase needed to fund it will hurt small businesses, but the mayor "
+     "said the investment was necessary to keep the city competitive. ") * 8,
+]
+
+CONTEXT = ("The capital of France is Paris and that city has a population of "
+           "2m people. The Eiffel Tower was completed in 1889.")
+QUESTIONS = [
+    "What is the capital of France?",
+    "What is the population of Paris?",
+    "When was the Eiffel Tower completed?",
+]
+MASKED = "Please buy [MASK] from the store."
+LABELS = ["politics", "sports", "economy", "travel"]
+
+DOCUMENT_PAGES = [[
+    ("INVOICE", [80, 40, 260, 70]),
+    ("Invoice", [80, 120, 170, 140]),
+    ("number:", [175, 120, 260, 140]),
+    ("INV-2024-0042", [270, 120, 450, 140]),
+    ("Date:", [80, 150, 140, 170]),
+    ("2024-03-14", [150, 150, 280, 170]),
+    ("Bill", [80, 200, 120, 220]),
+    ("to:", [125, 200, 160, 220]),
+    ("ACME", [170, 200, 240, 220]),
+    ("Corp", [245, 200, 300, 220]),
+    ("Total", [600, 800, 670, 820]),
+    ("due:", [675, 800, 730, 820]),
+    ("$1,250.00", [740, 800, 880, 820]),
+]]
+DOCUMENT_QUESTIONS = [
+    "What is the invoice number?",
+    "What is the total due?",
+    "What is the invoice date?",
+]
+
+
+def draw_image(seed: int, size=(640, 480)) -> Image.Image:
+    rng = random.Random(seed)
+    img = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        w, h = rng.randrange(20, 200), rng.randrange(20, 200)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+        shape((x, y, x + w, y + h), fill=color)
+    return img
+
+
+IMAGES = [draw_image(seed) for seed in range(4)]
+LARGE_IMAGE = draw_image(42, size=(3200, 2400))
+
+
+def cycle(items: list, count: int) -> list:
+    return [items[i % len(items)] for i in range(count)]
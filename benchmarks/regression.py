@@ -0,0 +1,314 @@
+"""
+Per-model performance and accuracy regression harness.
+
+Each processor function of `app/text/processors.py`, `app/image/processor.py`
+and `app/document/processor.py` runs over the fixed corpus of
+`benchmarks/corpus.py`, in its own process, and records:
+- the latency distribution of single-input calls,
+- the throughput at batch sizes 1, 8 and 32 (batchable processors only),
+- the peak resident memory of the process,
+- its outputs.
+
+Outputs are compared with the golden outputs committed in
+`benchmarks/golden/` and must match them within `--atol` at every batch size.
+They are CPU outputs, only rewritten on purpose, with `--update-golden`, when
+a model or a processor changes. A case without a golden output fails: record
+it on a CPU machine with the models cached and commit the file.
+
+Latency, throughput and memory depend on the hardware, so they are compared
+with a local baseline in `benchmarks/.baselines/`, recorded by the first run
+on a machine or with `--update`, and must not regress by more than
+`--max-slowdown` / `--max-memory`.
+
+The exit status is 1 on any regression or missing golden output. Models are
+loaded from the local Hugging Face cache only.
+
+Usage:
+```
+python -m benchmarks.regression                        # compare
+python -m benchmarks.regression --update               # reset the local baseline
+python -m benchmarks.regression --update-golden        # rewrite golden outputs
+python -m benchmarks.regression --only text.classify image.detect
+```
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+import orjson
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+from benchmarks.corpus import (CONTEXT, DOCUMENT_PAGES,  # noqa: E402
+                               DOCUMENT_QUESTIONS, IMAGES, LABELS,
+                               LARGE_IMAGE, MASKED, QUESTIONS, TEXTS, cycle)
+
+GOLDEN_DIR = Path(__file__).parent / "golden"
+BASELINE_DIR = Path(__file__).parent / ".baselines"
+BATCH_SIZES = (1, 8, 32)
+
+
+def text():
+    from app.text import processors
+    return processors
+
+
+def image():
+    from app.image import processor
+    return processor
+
+
+def document():
+    from app.document import processor
+    return processor
+
+
+async def stream(fragments):
+    """Streamed summaries are compared once joined."""
+    return "".join(fragments)
+
+
+def masks(segments):
+    """Segmentation masks are summarized by their coverage."""
+    return [{
+        "label": s["label"],
+        "coverage": sum(s["mask"].getdata()) / 255 / (s["mask"].size[0] *
+                                                       s["mask"].size[1])
+    } for s in segments]
+
+
+class Case(NamedTuple):
+    # `call(count, batch_size)` returns the processor coroutine; batchable
+    # cases get `count` inputs, the others ignore both arguments.
+    call: Callable
+    batched: bool = False
+    summarize: Callable = lambda output: output
+
+
+CASES = {
+    "text.classify":
+    Case(lambda n, bs: text().classify(cycle(TEXTS, n), batch_size=bs), True),
+    "text.analyze_sentiment":
+    Case(
+        lambda n, bs: text().analyze_sentiment(cycle(TEXTS, n),
+                                               batch_size=bs), True),
+    "text.summarize":
+    Case(lambda n, bs: text().summarize(TEXTS[-1], max_length=60)),
+    "text.summarize_stream":
+    Case(lambda n, bs: stream(text().summarize_stream(TEXTS[-1],
+                                                      max_length=60))),
+    "text.answer_question":
+    Case(lambda n, bs: text().answer_question(CONTEXT, QUESTIONS[0])),
+    "text.mask_filler":
+    Case(lambda n, bs: text().mask_filler(MASKED)),
+    "text.zero_shot_classify":
+    Case(lambda n, bs: text().zero_shot_classify(TEXTS[10], LABELS)),
+    "text.similarities_check":
+    Case(lambda n, bs: text().similarities_check(TEXTS[:8])),
+    "text.embed":
+    Case(lambda n, bs: text().embed(cycle(TEXTS, n), batch_size=bs), True),
+    "image.classify":
+    Case(lambda n, bs: image().classify(cycle(IMAGES, n), batch_size=bs),
+         True),
+    "image.detect":
+    Case(lambda n, bs: image().detect(cycle(IMAGES, n), batch_size=bs), True),
+    "image.detect_tiled":
+    Case(lambda n, bs: image().detect_tiled(LARGE_IMAGE)),
+    "image.segment":
+    Case(lambda n, bs: image().segment(IMAGES[0]), summarize=masks),
+    "document.answer_question":
+    Case(lambda n, bs: document().answer_question(DOCUMENT_PAGES,
+                                                  DOCUMENT_QUESTIONS)),
+}
+
+
+def jsonable(output):
+    from app.response import dumps
+    return orjson.loads(dumps(output))
+
+
+def percentiles(samples: list[float]) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    q = statistics.quantiles(ms, n=100, method="inclusive")
+    return {
+        "mean": statistics.fmean(ms),
+        "p50": q[49],
+        "p90": q[89],
+        "p99": q[98],
+    }
+
+
+def measure(name: str, runs: int) -> dict:
+    """Measure one case. Runs in a fresh process so that peak memory is the
+    one of this model alone."""
+    case = CASES[name]
+    loop = asyncio.new_event_loop()
+
+    def call(count, batch_size):
+        started = time.perf_counter()
+        output = loop.run_until_complete(case.call(count, batch_size))
+        return output, time.perf_counter() - started
+
+    call(1, 1)  # load the model
+    latencies = [call(1, 1)[1] for _ in range(runs)]
+    stats = {"latency_ms": percentiles(latencies), "throughput": {}}
+    if case.batched:
+        count = max(BATCH_SIZES)
+        stats["outputs"] = {}
+        for batch_size in BATCH_SIZES:
+            timings = []
+            for _ in range(3):
+                output, elapsed = call(count, batch_size)
+                timings.append(elapsed)
+            stats["throughput"][str(batch_size)] = count / min(timings)
+            stats["outputs"][str(batch_size)] = jsonable(
+                case.summarize(output))
+    else:
+        output, _ = call(None, 1)
+        stats["throughput"]["1"] = 1000 / stats["latency_ms"]["p50"]
+        stats["outputs"] = {"1": jsonable(case.summarize(output))}
+    stats["peak_rss_mb"] = resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss / 1024
+    return stats
+
+
+def diff(golden, current, atol: float, path: str = "") -> list[str]:
+    """List the places where `current` drifts from `golden`."""
+    if isinstance(golden, (int, float)) and isinstance(current, (int, float)):
+        if abs(golden - current) > atol:
+            return [f"{path}: {golden} != {current}"]
+        return []
+    if isinstance(golden, list) and isinstance(current, list):
+        if len(golden) != len(current):
+            return [f"{path}: {len(golden)} items != {len(current)} items"]
+        return [
+            d for i, (g, c) in enumerate(zip(golden, current))
+            for d in diff(g, c, atol, f"{path}[{i}]")
+        ]
+    if isinstance(golden, dict) and isinstance(current, dict):
+        if golden.keys() != current.keys():
+            return [f"{path}: keys {sorted(golden)} != {sorted(current)}"]
+        return [
+            d for key in golden
+            for d in diff(golden[key], current[key], atol, f"{path}.{key}")
+        ]
+    return [] if golden == current else [f"{path}: {golden!r} != {current!r}"]
+
+
+def drift(golden, outputs: dict, atol: float) -> list[str]:
+    """Compare the outputs at every batch size with the golden outputs."""
+    return [
+        d for batch_size, output in outputs.items()
+        for d in diff(golden, output, atol, f"outputs@{batch_size}")
+    ]
+
+
+def regressions(baseline: dict, current: dict, args) -> list[str]:
+    """Compare latency, throughput and memory with the local baseline."""
+    found = []
+    slow = 1 + args.max_slowdown
+    for key in ("p50", "p90"):
+        was, now = baseline["latency_ms"][key], current["latency_ms"][key]
+        if now > was * slow:
+            found.append(f"latency {key}: {was:.1f}ms -> {now:.1f}ms")
+    for batch_size, was in baseline["throughput"].items():
+        now = current["throughput"].get(batch_size, 0)
+        if now < was / slow:
+            found.append(
+                f"throughput@{batch_size}: {was:.1f}/s -> {now:.1f}/s")
+    was, now = baseline["peak_rss_mb"], current["peak_rss_mb"]
+    if now > was * (1 + args.max_memory):
+        found.append(f"peak memory: {was:.0f}MB -> {now:.0f}MB")
+    return found
+
+
+def runs_count(value: str) -> int:
+    """Percentiles need at least two samples."""
+    runs = int(value)
+    if runs < 2:
+        raise argparse.ArgumentTypeError("at least 2 runs are needed")
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.regression")
+    parser.add_argument("--only", nargs="+", choices=list(CASES))
+    parser.add_argument("--runs", type=runs_count, default=20)
+    parser.add_argument("--update",
+                        action="store_true",
+                        help="reset the local performance baseline")
+    parser.add_argument("--update-golden",
+                        action="store_true",
+                        help="rewrite the golden outputs")
+    parser.add_argument("--atol", type=float, default=1e-3)
+    parser.add_argument("--max-slowdown",
+                        type=float,
+                        default=0.2,
+                        help="tolerated latency and throughput regression")
+    parser.add_argument("--max-memory",
+                        type=float,
+                        default=0.2,
+                        help="tolerated peak memory growth")
+    args = parser.parse_args(argv)
+
+    GOLDEN_DIR.mkdir(exist_ok=True)
+    BASELINE_DIR.mkdir(exist_ok=True)
+    context = multiprocessing.get_context("spawn")
+    failed = False
+    print(f"{'case':<28}{'p50 ms':>9}{'p90 ms':>9}"
+          f"{'thr@1':>8}{'thr@8':>8}{'thr@32':>8}{'rss MB':>8}  status")
+    for name in args.only or CASES:
+        try:
+            with context.Pool(1) as pool:
+                stats = pool.apply(measure, (name, args.runs))
+        except (Exception, ) as exc:
+            print(f"{name:<28}  error: {exc}")
+            failed = True
+            continue
+        golden_file = GOLDEN_DIR / f"{name}.json"
+        baseline_file = BASELINE_DIR / f"{name}.json"
+        outputs = stats.pop("outputs")
+        notes, problems = [], []
+        if args.update_golden:
+            golden_file.write_bytes(
+                orjson.dumps(outputs["1"], option=orjson.OPT_INDENT_2))
+            notes.append("golden recorded")
+        elif not golden_file.exists():
+            problems.append("no golden output, run with --update-golden")
+        else:
+            problems += drift(orjson.loads(golden_file.read_bytes()),
+                              outputs, args.atol)
+        if args.update or not baseline_file.exists():
+            baseline_file.write_bytes(
+                orjson.dumps(stats, option=orjson.OPT_INDENT_2))
+            notes.append("baseline recorded")
+        else:
+            problems += regressions(orjson.loads(baseline_file.read_bytes()),
+                                    stats, args)
+        status = ", ".join(notes) or "ok"
+        if problems:
+            status = "REGRESSED"
+        failed = failed or bool(problems)
+        throughput = [
+            f"{stats['throughput'][str(b)]:>8.1f}"
+            if str(b) in stats["throughput"] else f"{'-':>8}"
+            for b in BATCH_SIZES
+        ]
+        print(f"{name:<28}{stats['latency_ms']['p50']:>9.1f}"
+              f"{stats['latency_ms']['p90']:>9.1f}{''.join(throughput)}"
+              f"{stats['peak_rss_mb']:>8.0f}  {status}")
+        for problem in problems:
+            print(f"    {problem}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Response serialization cost per endpoint.
+
+Compare, on synthetic payloads shaped like each endpoint output:
+- before: pydantic validation, FastAPI encoding and stdlib json rendering,
+- validated: the same validation and encoding rendered by orjson,
+- trusted: orjson rendering of the raw outputs (`LK_VALIDATE_RESPONSES=false`).
+
+Usage:
+```
+python -m benchmarks.serialization --repeat 200
+```
+"""
+import argparse
+import random
+import string
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.document import DocumentQuestionAnswerResponse
+from app.image import ClassifyResponse, DetectObjectResponse, SegmentResponse
+from app.response import ApiJSONResponse, ApiResponseList
+from app.text import (MaskFillerResponse, QuestionAnswerResponse,
+                      SentencesSimilarityResponse)
+
+random.seed(0)
+
+
+def word(size=8):
+    return "".join(random.choices(string.ascii_lowercase, k=size))
+
+
+def label(n):
+    return [{"label": word(), "score": random.random()} for _ in range(n)]
+
+
+PAYLOADS = {
+    "text/classifier": (ApiResponseList, label(512)),
+    "text/sentiment-analyzer": (ApiResponseList, label(512)),
+    "text/question-answering": (QuestionAnswerResponse, [{
+        "question": word(40),
+        "answer": {
+            "score": random.random(),
+            "start": 10,
+            "end": 20,
+            "answer": word(20)
+        }
+    } for _ in range(32)]),
+    "text/mask-filler": (MaskFillerResponse, [{
+        "score": random.random(),
+        "token": random.randint(0, 30000),
+        "token_str": word(),
+        "sequence": word(80)
+    } for _ in range(5)]),
+    "text/similarities-detector": (SentencesSimilarityResponse, [{
+        "sentence": word(80),
+        "score": random.random()
+    } for _ in range(512)]),
+    "image/classify": (ClassifyResponse, label(5)),
+    "image/detect-object": (DetectObjectResponse, [{
+        "score": random.random(),
+        "label": word(),
+        "box": {
+            "xmin": random.randint(0, 2000),
+            "ymin": random.randint(0, 2000),
+            "xmax": random.randint(0, 2000),
+            "ymax": random.randint(0, 2000)
+        }
+    } for _ in range(100)]),
+    "image/segment": (SegmentResponse, [{
+        "label": word(),
+        "image": word(64 * 1024)
+    } for _ in range(20)]),
+    "document/answer-questions": (DocumentQuestionAnswerResponse, [{
+        "question": word(40),
+        "answer": word(20),
+        "score": random.random(),
+        "start": 10,
+        "end": 20
+    } for _ in range(10)]),
+}
+
+
+def before(model, data):
+    return JSONResponse(jsonable_encoder(model(data=data))).body
+
+
+def validated(model, data):
+    return ApiJSONResponse(jsonable_encoder(model(data=data))).body
+
+
+def trusted(model, data):
+    return ApiJSONResponse({"error": None, "data": data}).body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"{'endpoint':<28}{'before':>10}{'validated':>12}{'trusted':>10}"
+          f"{'speedup':>9}  (ms per response)")
+    for endpoint, (model, data) in PAYLOADS.items():
+        timings = [
+            timeit.timeit(lambda: func(model, data), number=args.repeat) /
+            args.repeat * 1000 for func in (before, validated, trusted)
+        ]
+        print(f"{endpoint:<28}{timings[0]:>10.3f}{timings[1]:>12.3f}"
+              f"{timings[2]:>10.3f}{timings[0] / timings[2]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.admission import AdmissionController
+
+DOCUMENT, CLASSIFIER, EMBEDDINGS = ("document/answer-questions",
+                                    "text/classifier", "text/embeddings")
+
+
+def controller(**kwargs):
+    ctl = AdmissionController(max_inflight=16, reserved=4, **kwargs)
+    ctl.register(DOCUMENT, 30, prior=3)
+    ctl.register(CLASSIFIER, 1, prior=0.05)
+    ctl.register(EMBEDDINGS, 5, prior=0.2)
+    return ctl
+
+
+def admit(ctl, route):
+    """Return the admission time, or the status code of the rejection."""
+    try:
+        return asyncio.run(ctl.acquire(route, ctl.stats(route).slo))
+    except HTTPException as exc:
+        return exc.status_code
+
+
+def test_routes_start_from_their_prior():
+    ctl = controller()
+    assert ctl.is_heavy(DOCUMENT)
+    assert not ctl.is_heavy(CLASSIFIER)
+    ctl.register("text/new", 5)
+    assert ctl.is_heavy("text/new")
+
+
+def test_release_replaces_prior_with_measure():
+    ctl = controller()
+    admit(ctl, CLASSIFIER)
+    stats = ctl.stats(CLASSIFIER)
+    stats.started[0] -= 2  # as if admitted 2s ago
+    ctl.release(CLASSIFIER, stats.started[0])
+    assert stats.service_time == pytest.approx(2, abs=0.1)
+    assert ctl.is_heavy(CLASSIFIER)
+    started = admit(ctl, CLASSIFIER)
+    ctl.release(CLASSIFIER, started)
+    assert stats.service_time < 2
+
+
+def test_heavy_requests_use_their_own_slo():
+    ctl = controller()
+    assert admit(ctl, DOCUMENT) != 429
+    assert admit(ctl, DOCUMENT) != 429
+    ctl.stats(DOCUMENT).service_time = 20
+    assert admit(ctl, DOCUMENT) == 429
+
+
+def test_heavy_burst_leaves_reserved_slots():
+    ctl = controller()
+    ctl.stats(DOCUMENT).service_time = 1
+    statuses = [admit(ctl, DOCUMENT) for _ in range(16)]
+    assert statuses.count(503) == 4
+    assert ctl.inflight == 12
+    # a cheap route with room in its slo still gets a slot
+    assert admit(ctl, EMBEDDINGS) not in (429, 503)
+
+
+def test_cheap_wait_counts_running_heavy_work():
+    ctl = controller()
+    ctl.stats(DOCUMENT).service_time = 5
+    started = admit(ctl, DOCUMENT)
+    assert ctl.running_heavy() == pytest.approx(5, abs=0.1)
+    assert admit(ctl, CLASSIFIER) == 429
+    assert admit(ctl, EMBEDDINGS) not in (429, 503)
+    ctl.release(DOCUMENT, started)
+    assert ctl.running_heavy() == 0
+    assert admit(ctl, CLASSIFIER) not in (429, 503)
+
+
+def test_queued_heavy_work_is_left_out_of_cheap_wait():
+    ctl = controller()
+    for _ in range(5):
+        admit(ctl, DOCUMENT)
+    # 5 x 3s queued, but only the running one delays a cheap request
+    assert ctl.predicted_wait() == pytest.approx(15)
+    assert ctl.predicted_wait(heavy=False) == 0
+    assert admit(ctl, EMBEDDINGS) not in (429, 503)
@@ -0,0 +1,128 @@
+import io
+import wave
+
+import av
+import numpy as np
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app.audio import processor
+from app.audio.stream import FRAME, SAMPLE_RATE, split_chunks
+from app.settings import settings
+
+
+def tone(seconds, amplitude=0.5, freq=440):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def blocks(signal, size=1600):
+    return (signal[i:i + size] for i in range(0, len(signal), size))
+
+
+def to_wav(signal):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes((signal * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def test_split_chunks_cuts_on_quietest_frame():
+    # silence at 1.7-1.8s falls in the last quarter (1.5-2s) of the 1st chunk
+    signal = np.concatenate([tone(1.7), silence(0.1), tone(1.2)])
+    chunks = list(split_chunks(blocks(signal), 2.0, 0.5, -45.0))
+    # the cut is the first 30 ms frame of the search window fully silent
+    search_start = int(1.5 * SAMPLE_RATE)
+    frames = -(-(int(1.7 * SAMPLE_RATE) - search_start) // FRAME)
+    cut = search_start + frames * FRAME
+    assert chunks[0].start == 0
+    assert chunks[0].end == cut / SAMPLE_RATE
+    assert len(chunks[0].samples) == cut
+    # the next chunk starts `overlap` before the cut
+    assert chunks[1].start == (cut - SAMPLE_RATE // 2) / SAMPLE_RATE
+    assert chunks[-1].end == len(signal) / SAMPLE_RATE
+
+
+def test_split_chunks_drops_unvoiced_chunks():
+    signal = np.concatenate([tone(2.0), silence(4.0), tone(2.0)])
+    chunks = list(split_chunks(blocks(signal), 2.0, 0.0, -45.0))
+    assert chunks
+    for chunk in chunks:
+        assert np.abs(chunk.samples).max() > 0.1
+    assert not any(2.2 < c.start and c.end < 5.8 for c in chunks)
+    assert list(split_chunks(blocks(silence(5.0)), 2.0, 0.5, -45.0)) == []
+
+
+def test_stitch_drops_repeated_words():
+    assert processor.stitch("Hello and welcome to the",
+                            "To the show, everyone.") == "show, everyone."
+    assert processor.stitch("Hello there.", " General Kenobi ") == \
+        "General Kenobi"
+    assert processor.stitch("", "First chunk") == "First chunk"
+
+
+@pytest.fixture
+def client(monkeypatch):
+
+    def pipe(inputs, batch_size):
+        assert batch_size == len(inputs)
+        return [{"text": f"chunk of {len(i['raw'])}"} for i in inputs]
+
+    monkeypatch.setattr(processor, "get_pipeline", lambda model: pipe)
+    monkeypatch.setattr(settings, "ASR_CHUNK_SECONDS", 2.0)
+    monkeypatch.setattr(settings, "ASR_OVERLAP_SECONDS", 0.5)
+    monkeypatch.setattr(settings, "ASR_BATCH_SIZE", 2)
+    from app.audio import app
+    return TestClient(app)
+
+
+def upload(client, data, ctype="audio/wav", **params):
+    return client.post("/transcribe",
+                       params=params,
+                       files={"payload": ("clip.wav", data, ctype)})
+
+
+def test_transcribe_streams_ndjson(client):
+    signal = np.concatenate([tone(1.7), silence(0.1), tone(3.0)])
+    response = upload(client, to_wav(signal))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [line for line in response.iter_lines() if line]
+    parts = [orjson.loads(line) for line in lines]
+    assert len(parts) > 2
+    assert all({"start", "end", "text"} <= p.keys() for p in parts[:-1])
+    assert parts[-1]["text"].startswith(parts[0]["text"])
+
+
+def test_transcribe_full(client):
+    response = upload(client, to_wav(tone(1.0)), stream="false")
+    assert response.status_code == 200
+    assert response.json()["data"]["text"] == f"chunk of {SAMPLE_RATE}"
+
+
+def test_transcribe_rejects_corrupt_file(client):
+    response = upload(client, b"RIFF\x00\x00garbage" * 64)
+    assert response.status_code == 400
+
+
+def test_transcribe_rejects_file_without_audio(client):
+    buf = io.BytesIO()
+    with av.open(buf, "w", format="matroska") as container:
+        stream = container.add_stream("mjpeg", rate=1)
+        stream.width, stream.height, stream.pix_fmt = 16, 16, "yuvj420p"
+        frame = av.VideoFrame.from_ndarray(np.zeros((16, 16, 3), np.uint8),
+                                           format="rgb24")
+        for packet in stream.encode(frame.reformat(format="yuvj420p")):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    response = upload(client, buf.getvalue())
+    assert response.status_code == 400
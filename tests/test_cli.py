@@ -0,0 +1,22 @@
+import json
+
+from app import cli
+
+
+def test_rows_without_field_get_an_error_line(tmp_path, monkeypatch):
+    # workers are forked, so they see the stubs
+    monkeypatch.setattr(cli, "init_worker", lambda threads: None)
+    monkeypatch.setattr(cli, "infer",
+                        lambda task, inputs, *args: [len(x) for x in inputs])
+    source = tmp_path / "texts.jsonl"
+    rows = [{"text": "a"}, {"id": 2}, {"text": None}, {"text": "abc"}]
+    source.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    output = tmp_path / "results.jsonl"
+    cli.main(["classifier", str(source), str(output), "--workers", "1"])
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert lines == [
+        {"index": 0, "result": 1},
+        {"index": 1, "error": "missing field 'text'"},
+        {"index": 2, "error": "missing field 'text'"},
+        {"index": 3, "result": 3},
+    ]
@@ -0,0 +1,12 @@
+import pytest
+
+from app.main import enabled_apps
+
+
+def test_enabled_apps_strips_entries():
+    assert enabled_apps([" text", "image ", "", "text"]) == ["text", "image"]
+
+
+def test_enabled_apps_rejects_unknown_names():
+    with pytest.raises(ValueError, match="imgae"):
+        enabled_apps(["text", "imgae"])
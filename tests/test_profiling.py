@@ -0,0 +1,75 @@
+from contextlib import nullcontext
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import profiling
+from app.settings import settings
+
+
+def event(name, parent=None, cpu=0.0):
+    return SimpleNamespace(name=name,
+                           cpu_parent=parent,
+                           self_cpu_time_total=cpu)
+
+
+def test_operators_grouped_by_model():
+    session = profiling.ProfileSession(seconds=1, torch_profile=False)
+    session.ranges = {"bert", "detr"}
+    bert, detr = event("bert"), event("detr")
+    linear = event("aten::linear", bert)
+    events = [
+        bert, detr, linear,
+        event("aten::addmm", linear, cpu=3000),
+        event("aten::addmm", bert, cpu=1000),
+        event("aten::conv2d", detr, cpu=500),
+        event("aten::copy_", cpu=200),
+    ]
+    session._torch = SimpleNamespace(events=lambda: events)
+    operators = session.operators()
+    assert operators["bert"][0] == {
+        "op": "aten::addmm",
+        "calls": 2,
+        "self_cpu_ms": 4.0
+    }
+    assert [op["op"] for op in operators["bert"]] == [
+        "aten::addmm", "aten::linear"
+    ]
+    assert operators["detr"] == [{
+        "op": "aten::conv2d",
+        "calls": 1,
+        "self_cpu_ms": 0.5
+    }]
+    assert operators["other"][0]["op"] == "aten::copy_"
+
+
+def test_traced_records_calls_and_methods(monkeypatch):
+    names = []
+    monkeypatch.setattr(profiling, "record",
+                        lambda name: names.append(name) or nullcontext())
+    model = SimpleNamespace(encode=lambda x: [x], tokenizer="tok")
+    traced = profiling.Traced(model, "mpnet", methods=("encode", ))
+    assert traced.encode(1) == [1]
+    assert traced.tokenizer == "tok"
+    assert names == ["mpnet"]
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    from app.admin import app
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("token",
+                         [b"", b"wrong", "s\xe9cret".encode("latin-1")])
+def test_admin_rejects_bad_tokens(admin, token):
+    response = admin.get("/profile", headers={"X-Admin-Token": token})
+    assert response.status_code == 403
+
+
+def test_admin_accepts_token(admin, monkeypatch):
+    monkeypatch.setattr(profiling, "session", None)
+    response = admin.get("/profile", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 404
@@ -0,0 +1,87 @@
+from argparse import Namespace
+
+import pytest
+
+from benchmarks import regression
+
+BASELINE = {
+    "latency_ms": {
+        "mean": 10,
+        "p50": 10,
+        "p90": 12,
+        "p99": 15
+    },
+    "throughput": {
+        "1": 100,
+        "8": 400
+    },
+    "peak_rss_mb": 500,
+}
+LIMITS = Namespace(max_slowdown=0.2, max_memory=0.2)
+
+
+def test_diff_tolerates_small_numeric_drift():
+    golden = [{"label": "cat", "score": 0.9, "box": [1, 2, 3, 4]}]
+    same = [{"label": "cat", "score": 0.9004, "box": [1, 2, 3, 4]}]
+    assert regression.diff(golden, same, atol=1e-3) == []
+
+
+def test_diff_reports_paths():
+    golden = [{"label": "cat", "score": 0.9}, {"label": "dog", "score": 0.1}]
+    current = [{"label": "cow", "score": 0.9}, {"label": "dog", "score": 0.2}]
+    assert regression.diff(golden, current, atol=1e-3) == [
+        "[0].label: 'cat' != 'cow'",
+        "[1].score: 0.1 != 0.2",
+    ]
+    assert regression.diff([1], [1, 2], 1e-3) == [": 1 items != 2 items"]
+    assert regression.diff({"a": 1}, {"b": 1}, 1e-3) == [
+        ": keys ['a'] != ['b']"
+    ]
+    assert regression.diff("a", 1, 1e-3) == [": 'a' != 1"]
+
+
+def test_drift_checks_every_batch_size():
+    golden = [{"label": "cat"}]
+    outputs = {"1": [{"label": "cat"}], "8": [{"label": "dog"}]}
+    assert regression.drift(golden, outputs, 1e-3) == [
+        "outputs@8[0].label: 'cat' != 'dog'"
+    ]
+
+
+def test_regressions_within_limits():
+    current = {
+        "latency_ms": {
+            "p50": 11.9,
+            "p90": 14
+        },
+        "throughput": {
+            "1": 90,
+            "8": 340
+        },
+        "peak_rss_mb": 590,
+    }
+    assert regression.regressions(BASELINE, current, LIMITS) == []
+
+
+def test_regressions_past_limits():
+    current = {
+        "latency_ms": {
+            "p50": 13,
+            "p90": 12
+        },
+        "throughput": {
+            "1": 100
+        },
+        "peak_rss_mb": 700,
+    }
+    assert regression.regressions(BASELINE, current, LIMITS) == [
+        "latency p50: 10.0ms -> 13.0ms",
+        "throughput@8: 400.0/s -> 0.0/s",
+        "peak memory: 500MB -> 700MB",
+    ]
+
+
+def test_runs_below_two_are_rejected():
+    with pytest.raises(SystemExit):
+        regression.main(["--runs", "1"])
+    assert regression.runs_count("2") == 2
@@ -0,0 +1,46 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import admission
+from app.admission import AdmissionController
+from app.settings import settings
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from app.text import app, processors
+
+    async def classify(texts, **kwargs):
+        return [{"label": "POSITIVE", "score": 1.0} for _ in texts]
+
+    monkeypatch.setattr(processors, "classify", classify)
+    monkeypatch.setattr(settings, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(admission, "controller", AdmissionController(4))
+    return TestClient(app)
+
+
+def ask(client, text="I love it"):
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_json({"id": 1, "task": "classifier", "text": text})
+        return websocket.receive_json()
+
+
+def test_ws_batches_go_through_admission(client):
+    assert ask(client) == {
+        "id": 1,
+        "data": {
+            "label": "POSITIVE",
+            "score": 1.0
+        }
+    }
+    stats = admission.controller.routes["text/classifier"]
+    assert stats.measured
+    assert stats.inflight == 0
+
+
+def test_ws_batches_rejected_by_admission(client, monkeypatch):
+    monkeypatch.setitem(admission.slos, "text/classifier", -1.0)
+    assert ask(client, "rejected") == {
+        "id": 1,
+        "error": "server busy, retry later"
+    }
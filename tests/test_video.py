@@ -0,0 +1,122 @@
+import io
+
+import av
+import numpy as np
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.image import processor
+from app.settings import settings
+from app.video.stream import Sampling, dedup_frames, dhash, sample_frames
+
+RATE = 10
+
+
+def frame(value, size=64):
+    """A horizontal gradient, shifted by `value`, so that it has a dhash."""
+    ramp = np.linspace(0, 127, size, dtype=np.uint8)
+    pixels = np.tile(ramp + value, (size, 1))
+    return np.stack([pixels] * 3, axis=-1)
+
+
+def to_video(frames, codec="mpeg4", gop_size=RATE):
+    buf = io.BytesIO()
+    with av.open(buf, "w", format="matroska") as container:
+        stream = container.add_stream(codec, rate=RATE)
+        stream.width, stream.height, stream.pix_fmt = 64, 64, "yuv420p"
+        stream.codec_context.gop_size = gop_size
+        for pixels in frames:
+            image = av.VideoFrame.from_ndarray(pixels, format="rgb24")
+            for packet in stream.encode(image.reformat(format="yuv420p")):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    buf.seek(0)
+    return buf
+
+
+def cut_at(seconds, total=3.0):
+    """Dark frames, then bright ones from `seconds` on."""
+    count = int(total * RATE)
+    return [frame(0 if i < seconds * RATE else 128) for i in range(count)]
+
+
+def timestamps(samples):
+    return [round(t, 3) for t, _ in samples]
+
+
+def test_sample_frames_at_fixed_rate():
+    samples = list(sample_frames(to_video(cut_at(1.5)), Sampling.fps, 2.0))
+    assert timestamps(samples) == [0.0, 0.5, 1.0, 1.5, 2.0, 2.5]
+    assert all(isinstance(img, Image.Image) for _, img in samples)
+
+
+def test_sample_frames_keyframes_only():
+    # no cut, so the encoder adds no keyframe on top of the GOP ones
+    video = to_video([frame(0)] * 3 * RATE)
+    samples = list(sample_frames(video, Sampling.keyframes))
+    assert timestamps(samples) == [0.0, 1.0, 2.0]
+
+
+def test_sample_frames_on_scene_changes():
+    samples = list(
+        sample_frames(to_video(cut_at(1.5)), Sampling.scene,
+                      scene_threshold=0.3))
+    assert timestamps(samples) == [0.0, 1.5]
+
+
+def test_dhash_ignores_brightness_not_structure():
+    ramp = Image.fromarray(frame(0))
+    brighter = Image.fromarray(frame(100))
+    flipped = ramp.transpose(Image.FLIP_LEFT_RIGHT)
+    assert dhash(ramp) == dhash(brighter)
+    assert bin(dhash(ramp) ^ dhash(flipped)).count("1") == 64
+
+
+def test_dedup_frames_keeps_changes_only():
+    ramp = Image.fromarray(frame(0))
+    flipped = ramp.transpose(Image.FLIP_LEFT_RIGHT)
+    frames = [(0.0, ramp), (1.0, ramp), (2.0, flipped), (3.0, ramp)]
+    kept = list(dedup_frames(iter(frames), max_distance=4))
+    assert timestamps(kept) == [0.0, 2.0, 3.0]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+
+    def pipe(images, batch_size):
+        assert batch_size == len(images)
+        calls.append(batch_size)
+        return [[{"score": 1.0, "label": "ramp"}] for _ in images]
+
+    monkeypatch.setattr(processor, "get_pipeline", lambda task, model: pipe)
+    monkeypatch.setattr(settings, "VIDEO_BATCH_SIZE", 4)
+    from app.video import app
+    client = TestClient(app)
+    client.calls = calls
+    return client
+
+
+def upload(client, data, **params):
+    payload = ("clip.mkv", data, "video/x-matroska")
+    return client.post("/classify", params=params, files={"payload": payload})
+
+
+def test_classify_streams_batches(client):
+    video = to_video(cut_at(1.5)).getvalue()
+    response = upload(client, video, fps=2.0, dedup="false")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [orjson.loads(line) for line in response.iter_lines() if line]
+    assert [line["timestamp"] for line in lines] == \
+        [0.0, 0.5, 1.0, 1.5, 2.0, 2.5]
+    assert lines[0]["data"] == [{"score": 1.0, "label": "ramp"}]
+    assert client.calls == [4, 2]
+
+
+def test_classify_rejects_corrupt_file(client):
+    response = upload(client, b"\x1aE\xdf\xa3garbage" * 64)
+    assert response.status_code == 400